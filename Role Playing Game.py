@@ -1,201 +1,34 @@
+##Examples and tests for the game engine in role_playing_game.py.
+##Run this file to run them: python "Role Playing Game.py"
 
+import asyncio
 import check
-import math
-
-##Constants:
-increase_factor = 0.1
-punch_factor_st = 2
-
-
-class Character:
-  ''' 
-  Fields: 
-     name(Str) 
-     st(Nat)
-     hp(Nat)
-     max_hp(Nat)
-     mp(Nat)
-     max_mp(Nat)
-     level(Nat)
-     
-  Requires:  
-     st, max_hp are both strictly greater than 0.
-  '''
-  def __init__(self, new_name, strength, 
-               maximumHP, maximumMP):
-    '''
-    Initializes a Character object self with 
-    name new_name, st strength,
-    hp and max_hp of maximumHP, and
-    mp and max_mp of maximumMP, and
-    level should start at 1.
-    
-    Effects: Mutates self
-    
-    __init__: Character Str Nat Nat Nat -> None
-    Requires
-      0 < strength, maximumHP, level
-      maximumHP > hp
-      maximumMP > mp
-    '''
-    self.name = new_name
-    self.st = strength
-    self.hp = maximumHP
-    self.max_hp = maximumHP
-    self.mp = maximumMP
-    self.max_mp = maximumMP
-    self.level = 1
-
-    
-  def __eq__(self, other):
-    '''
-    Returns True if self and other are equal and False otherwise
-    
-    __eq__: Character Any -> Bool
-    '''
-    return isinstance(other, Character) and \
-        self.name == other.name and \
-        self.st == other.st and \
-        self.hp == other.hp and \
-        self.max_hp == other.max_hp and \
-        self.mp == other.mp and \
-        self.max_mp == other.max_mp and \
-        self.level == other.level
-
-  
-  def __repr__(self):
-    '''
-    Returns a string representation of self
-    
-    __repr__: Character -> Str
-    '''
-    game_string = ("{0.name}"
-                   "\nLevel: {0.level}"
-                   "\nStrength: {0.st}"
-                   "\nHP: {0.hp}/{0.max_hp}"
-                   "\nMP: {0.mp}/{0.max_mp}")
-    return game_string.format(self)
-
-  
-  def cast_spell(self, cost, damage, enemy):
-    '''
-    Casts a spell if self is able that requires cost mp to cast and
-    deals damage to enemy. A message is printed if the enemy is 
-    defeated or there was not enough mp to cast the spell.
-    
-    Effects: 
-       Prints to screen
-       Mutates self
-       Mutates enemy
-    
-    cast_spell: Character Nat Nat Character -> None
-    
-    Examples:
-       c = Character("Test", 1, 4, 5)
-       e = Character("Test", 1, 4, 5)
-       c.cast_spell(3, 10, e) => None
-       and e.hp is mutated to 0
-       and c.mp is mutated to 2
-       and "Enemy defeated" is printed (no quotes).
-       
-       c = Character("Test", 1, 4, 5)
-       e = Character("Test", 1, 4, 5)
-       c.cast_spell(13, 10, e) => None
-       and "Not enough MP" is printed (no quotes).
-       
-       c = Character("Test", 1, 4, 5)
-       e = Character("Test", 1, 4, 5)
-       c.cast_spell(3, 2, e) => None
-       and e.hp is mutated to 2
-       and c.mp is mutated to 2
-    '''
-    error_msg = "Not enough MP"
-    defeated_msg = "Enemy defeated"
-    if self.mp < cost:
-      print(error_msg)
-    if enemy.hp <= 0:
-      print(defeated_msg)
-    if (self.mp >= cost) and (enemy.hp > 0):
-      self.mp = self.mp - cost
-      enemy.hp = enemy.hp - damage
-      if enemy.hp <= 0:
-        enemy.hp = 0
-        print(defeated_msg)
-
-
-  def level_up(self):
-    '''
-    Performs a level-up for self. Increase stats 10% plus 1
-    via mutation of self.
-    
-    Effects: Mutates self
-    
-    level_up: Character -> None
-    
-    Examples:
-       c = Character("Test", 1, 4, 5)
-       c.level_up() => None
-       and c.level is mutated to 2
-       and c.st is mutated to 2
-       and c.hp is mutated to 5
-       and c.max_hp is mutated to 5
-       and c.mp is mutated to 6
-       and c.max_mp is mutated to 6
-    '''
-    self.level = self.level + 1
-    st_increase = math.floor(increase_factor * self.st) + 1
-    self.st = self.st + st_increase
-    hp_increase = math.floor(increase_factor * self.max_hp) + 1
-    self.max_hp = self.max_hp + hp_increase
-    self.hp = self.hp + hp_increase
-    mp_increase = math.floor(increase_factor * self.max_mp) + 1
-    self.max_mp = self.max_mp + mp_increase
-    self.mp = self.mp + mp_increase
-
-
-def all_punch(players, enemy):
-  '''
-  Returns None but simulates all the characters (players) 
-  in the list of characters, players, punching an enemy 
-  character. Each Character in players will hit the enemy
-  mutating enemy, by dealing damage to them and thus,
-  decreasing their hp by twice the, st, strength statistic
-  of each individual Character in players, and if the
-  enemy runs out of hp, their hp is set to 0, and each 
-  character in players is mutated by levelling up. 
-  
-  Effects: Mutates players
-           Mutates enemy
-  
-  all_punch: (listof Character) Character -> None
-  Requires: enemy cannot be a member of the list of 
-              characters, players. 
-            for each player in the list and the enemy
-              the following must hold:
-               0 < strength, maximumHP, level
-               maximumHP > hp
-               maximumMP > mp
-  
-  Examples:
-     d1 = Character("C1", 10, 10, 10)
-     d2 = Character("C2", 1, 10, 10)
-     d3 = Character("C3", 20, 20, 10)
-     e2 = Character("E2", 20, 20, 10)
-     L = [d1, d2, d3]
-     all_punch(L, e2) => None
-     and e.hp is mutated to 0
-     and all of all of d1, d2, d3 have levelled up.
-     
-     all_punch([], e2) => None
-     and no mutation occurs
-  '''
-  for character in players:
-    player_st = (character.st * punch_factor_st)
-    enemy.hp = enemy.hp - player_st
-  if enemy.hp <= 0:
-    enemy.hp = 0
-    for character in players:
-      character.level_up()
+import copy
+import io
+import json
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+from array import array
+from role_playing_game import (Character, CharacterPool, Event, NullSink,
+                               Party, PunchResult, RingBufferSink, Transaction,
+                               all_punch,
+                               all_punch_batch, all_punch_detailed,
+                               render_roster,
+                               cast_already_defeated, cast_hit, cast_kill,
+                               cast_many, cast_not_enough_mp, grown_stat,
+                               set_event_sink)
+from roster import RosterError, open_roster, padding, write_roster
+from replay import apply_action, log_action, read_actions, replay
+from server import BattleServer, connect, start
+from simulator import simulate, summary
+from process_tests import collected_report, plain_tests
+import profiling
+from world import World
+import replay as replay_module
+import role_playing_game
 
 
 ##The following are defined for testing purposes.
@@ -647,3 +480,1446 @@ check.expect("Test 6: Mutation: d8 hp", d8.hp, 26)
 check.expect("Test 6: Mutation: d8 max_hp", d8.max_hp, 26)
 check.expect("Test 6: Mutation: d8 mp", d8.mp, 19)
 check.expect("Test 6: Mutation: d8 max_mp", d8.max_mp, 19)
+
+
+##Examples for CharacterPool:
+
+p1 = CharacterPool([Character("C1", 10, 10, 10),
+                    Character("C4", 1, 12, 13)])
+check.expect("Example 1: CharacterPool len", len(p1), 2)
+check.expect("Example 1: CharacterPool row",
+             p1[0] == Character("C1", 10, 10, 10), True)
+check.expect("Example 1: CharacterPool negative row",
+             p1[-1] == Character("C4", 1, 12, 13), True)
+
+check.expect("Example 2: CharacterPool level_up mask",
+             p1.level_up([True, False]), None)
+f1 = Character("C1", 10, 10, 10)
+f1.level_up()
+check.expect("Example 2: Mutation: p1[0]",
+             p1[0] == f1, True)
+check.expect("Example 2: No Mutation: p1[1]",
+             p1[1] == Character("C4", 1, 12, 13), True)
+
+
+##Tests for CharacterPool:
+
+p2 = CharacterPool()
+check.expect("Test 1: CharacterPool empty", len(p2), 0)
+check.expect("Test 1: CharacterPool empty level_up", p2.level_up(), None)
+
+r1 = p2.add("Fay", 12, 10, 11)
+r2 = p2.add("Jay", 11, 99, 97)
+check.expect("Test 2: CharacterPool add",
+             r1 == Character("Fay", 12, 10, 11), True)
+check.expect("Test 2: CharacterPool add columns", list(p2.st), [12, 11])
+
+check.expect("Test 3: CharacterPool level_up all", p2.level_up(), None)
+f1 = Character("Fay", 12, 10, 11)
+f1.level_up()
+f2 = Character("Jay", 11, 99, 97)
+f2.level_up()
+check.expect("Test 3: Mutation: p2[0]",
+             p2[0] == f1, True)
+check.expect("Test 3: Mutation: p2[1]",
+             p2[1] == f2, True)
+check.expect("Test 3: Mutation: r1 sees pool", r1.level, 2)
+
+check.set_print_exact("Enemy defeated")
+check.expect("Test 4: CharacterRow cast_spell", r2.cast_spell(13, 12, r1),
+             None)
+check.expect("Test 4: Mutation: p2 hp column", list(p2.hp), [0, 109])
+check.expect("Test 4: Mutation: p2 mp column", list(p2.mp), [13, 94])
+
+c0 = Character("Test", 0, 0, 0)
+p3 = CharacterPool([c0])
+c0.level_up()
+p3.level_up([1])
+check.expect("Test 5: CharacterPool level_up zero stats",
+             p3[0] == c0, True)
+
+check.set_print_exact(
+  "Fay",
+  "Level: 2",
+  "Strength: 14",
+  "HP: 0/12",
+  "MP: 13/13",)
+check.expect("Test 6: CharacterRow __repr__", print(p2[0]), None)
+
+pool_characters = list(map(lambda i: Character("P", 1 + i * 37, 5 + i * 91,
+                                               3 + i * 53), range(40)))
+p4 = CharacterPool(pool_characters)
+columns = [p4.level, p4.st, p4.hp, p4.max_hp, p4.mp, p4.max_mp]
+p4.level_up()
+p4.level_up(list(map(lambda i: i % 3 == 0, range(40))))
+p4.level_up([True] * 40)
+for i in range(40):
+  pool_characters[i].level_up(2 + (i % 3 == 0))
+check.expect("Test 7: CharacterPool level_up matches Character.level_up",
+             list(map(lambda i: p4[i] == pool_characters[i], range(40))),
+             [True] * 40)
+check.expect("Test 7: CharacterPool level_up updates columns in place",
+             list(map(lambda old, new: old is new, columns,
+                      [p4.level, p4.st, p4.hp, p4.max_hp, p4.mp, p4.max_mp])),
+             [True] * 6)
+hp_column = p2.hp
+all_punch_batch(p4, [0, 40, 40], p2)
+check.expect("Test 8: all_punch_batch updates enemy hp in place",
+             [hp_column is p2.hp, list(hp_column)], [True, [0, 109]])
+
+
+##Examples for level_up with n and level_up_to:
+
+c = Character("Test", 1, 4, 5)
+check.expect("Example 1: level_up 2", c.level_up(2), None)
+check.expect("Example 1 level_up 2: Mutation: c level", c.level, 3)
+check.expect("Example 1 level_up 2: Mutation: c st", c.st, 3)
+check.expect("Example 1 level_up 2: Mutation: c hp", c.hp, 6)
+check.expect("Example 1 level_up 2: Mutation: c max_hp", c.max_hp, 6)
+check.expect("Example 1 level_up 2: Mutation: c mp", c.mp, 7)
+check.expect("Example 1 level_up 2: Mutation: c max_mp", c.max_mp, 7)
+
+c = Character("Test", 1, 4, 5)
+check.expect("Example 2: level_up_to", c.level_up_to(3), None)
+check.expect("Example 2 level_up_to: Mutation: c level", c.level, 3)
+check.expect("Example 2 level_up_to: Mutation: c st", c.st, 3)
+
+
+##Tests for level_up with n, level_up_to and grown_stat:
+
+check.expect("Test 1: grown_stat 0 levels", grown_stat(10, 0), 10)
+check.expect("Test 2: grown_stat 1 level", grown_stat(10, 1), 12)
+check.expect("Test 3: grown_stat 3 levels", grown_stat(10, 3), 16)
+check.expect("Test 4: grown_stat from 0", grown_stat(0, 2), 2)
+
+c = Character("Test", 1, 4, 5)
+check.expect("Test 1: level_up 0", c.level_up(0), None)
+check.expect("Test 1 level_up 0: No Mutation: c",
+             c == Character("Test", 1, 4, 5), True)
+
+c = Character("Jay", 11, 99, 97)
+e = Character("Jay", 11, 99, 97)
+h = Character("Fay", 12, 10, 11)
+h.cast_spell(0, 30, c)
+h.cast_spell(0, 30, e)
+c.cast_spell(7, 0, h)
+e.cast_spell(7, 0, h)
+for i in range(500):
+  e.level_up()
+check.expect("Test 2: level_up 500 matches 500 single level_ups",
+             c.level_up(500), None)
+check.expect("Test 2 level_up 500: Mutation: c", c == e, True)
+check.expect("Test 2 level_up 500: Mutation: c hp below max",
+             c.max_hp - c.hp, 30)
+check.expect("Test 2 level_up 500: Mutation: c mp below max",
+             c.max_mp - c.mp, 7)
+
+c = Character("Fay", 12, 10, 11)
+c.level_up(4)
+check.expect("Test 3: level_up_to current level", c.level_up_to(5), None)
+check.expect("Test 3 level_up_to: No Mutation: c level", c.level, 5)
+check.expect("Test 4: level_up_to higher level", c.level_up_to(7), None)
+e = Character("Fay", 12, 10, 11)
+e.level_up(6)
+check.expect("Test 4 level_up_to: Mutation: c", c == e, True)
+
+c = Character("Fay", 12, 10, 11)
+try:
+  c.level_up(-1)
+  rejected = False
+except ValueError:
+  rejected = True
+check.expect("Test 5: level_up negative", rejected, True)
+check.expect("Test 5 level_up negative: No Mutation: c",
+             c == Character("Fay", 12, 10, 11), True)
+
+check.expect("Test 5: grown_stat 20 levels matches 20 single levels",
+             grown_stat(10, 20), grown_stat(grown_stat(10, 10), 10))
+role_playing_game.growth_tables.clear()
+for x in range(role_playing_game.growth_tables_max + 10):
+  grown_stat(x, role_playing_game.growth_memo_min)
+check.expect("Test 6: grown_stat tables are bounded",
+             len(role_playing_game.growth_tables) <=
+             role_playing_game.growth_tables_max, True)
+
+
+##Examples for all_punch_batch:
+
+party1 = [Character("C1", 10, 10, 10), Character("C2", 1, 10, 10),
+          Character("C3", 20, 20, 10)]
+party2 = [Character("C4", 1, 12, 13), Character("C5", 1, 20, 15)]
+foe1 = Character("E2", 20, 20, 10)
+foe2 = Character("E4", 20, 30, 20)
+players = CharacterPool(party1 + party2)
+enemies = CharacterPool([foe1, foe2])
+check.expect("Example 1: all_punch_batch",
+             all_punch_batch(players, [0, 3, 5], enemies), None)
+all_punch(party1, foe1)
+all_punch(party2, foe2)
+check.expect("Example 1: all_punch_batch: Mutation: enemies",
+             [enemies[0] == foe1, enemies[1] == foe2], [True, True])
+check.expect("Example 1: all_punch_batch: Mutation: players",
+             list(map(lambda i: players[i] == (party1 + party2)[i],
+                      range(5))),
+             [True] * 5)
+
+players = CharacterPool()
+enemies = CharacterPool([Character("E3", 20, 30, 10)])
+check.expect("Example 2: all_punch_batch empty party",
+             all_punch_batch(players, [0, 0], enemies), None)
+check.expect("Example 2: all_punch_batch: No Mutation: enemy",
+             enemies[0].hp, 30)
+
+
+##Tests for all_punch_batch:
+
+check.expect("Test 1: all_punch_batch no encounters",
+             all_punch_batch(CharacterPool(), [0], CharacterPool()), None)
+
+party1 = [Character("C6", 1, 15, 17), Character("C7", 3, 13, 15),
+          Character("C8", 10, 20, 15)]
+party2 = []
+party3 = [Character("C2", 1, 10, 10)]
+foe1 = Character("E5", 20, 15, 20)
+foe2 = Character("E1", 2, 0, 10)
+foe3 = Character("E9", 100, 90, 20)
+players = CharacterPool(party1 + party2 + party3)
+enemies = CharacterPool([foe1, foe2, foe3])
+check.expect("Test 2: all_punch_batch exact 0 hp, already 0 hp, no kill",
+             all_punch_batch(players, [0, 3, 3, 4], enemies), None)
+all_punch(party1, foe1)
+all_punch(party2, foe2)
+all_punch(party3, foe3)
+check.expect("Test 2: all_punch_batch: Mutation: enemies hp",
+             list(enemies.hp), [foe1.hp, foe2.hp, foe3.hp])
+check.expect("Test 2: all_punch_batch: Mutation: enemies hp values",
+             list(enemies.hp), [0, 0, 88])
+check.expect("Test 2: all_punch_batch: Mutation: players",
+             list(map(lambda i: players[i] == (party1 + party3)[i],
+                      range(4))),
+             [True] * 4)
+check.expect("Test 2: all_punch_batch: Mutation: players level",
+             list(players.level), [2, 2, 2, 1])
+
+
+##Examples for event sinks:
+
+sink = RingBufferSink(10)
+old_sink = set_event_sink(sink)
+c = Character("Test", 1, 4, 5)
+e = Character("Test", 1, 4, 5)
+check.set_print_exact("")
+check.expect("Example 1: RingBufferSink cast_spell: nothing printed",
+             c.cast_spell(3, 10, e), None)
+check.expect("Example 1: RingBufferSink drain",
+             sink.drain(), [Event("spell_kill", c, e, 3, 10)])
+check.expect("Example 1: RingBufferSink drained", sink.drain(), [])
+check.expect("Example 2: set_event_sink restores",
+             set_event_sink(old_sink), sink)
+
+
+##Tests for event sinks:
+
+sink = RingBufferSink(2)
+old_sink = set_event_sink(sink)
+c = Character("Test", 1, 4, 0)
+e = Character("Test", 1, 0, 5)
+c.cast_spell(13, 10, e)
+check.expect("Test 1: RingBufferSink failed and blocked",
+             sink.drain(1), [Event("spell_failed", c, e, 13, 10)])
+check.expect("Test 1: RingBufferSink rest",
+             sink.drain(5), [Event("spell_blocked", c, e, 13, 10)])
+
+c = Character("Test", 1, 4, 5)
+e = Character("Test", 1, 20, 6)
+c.cast_spell(1, 2, e)
+c.level_up(3)
+all_punch([c], e)
+check.expect("Test 2: RingBufferSink dropped", sink.dropped, 1)
+check.expect("Test 2: RingBufferSink keeps newest",
+             sink.drain(),
+             [Event("level_up", c, None, 0, 3),
+              Event("punch_hit", [c], e, 0, 8)])
+
+set_event_sink(NullSink())
+c = Character("Test", 1, 4, 0)
+check.set_print_exact("")
+check.expect("Test 3: NullSink prints nothing",
+             c.cast_spell(13, 10, Character("Test", 1, 0, 5)), None)
+check.expect("Test 4: set_event_sink restores",
+             isinstance(set_event_sink(old_sink), NullSink), True)
+
+c = Character("Test", 1, 4, 5)
+e = Character("Test", 1, 0, 5)
+check.set_print_exact("Not enough MP", "Enemy defeated")
+check.expect("Test 5: StdoutSink prints both messages",
+             c.cast_spell(13, 10, e), None)
+
+
+##Examples for cast_many:
+
+c = Character("Test", 1, 4, 5)
+e = Character("Test", 1, 4, 5)
+check.set_print_exact("")
+check.expect("Example 1: cast_many",
+             cast_many([(c, 3, 2, e), (c, 3, 2, e), (c, 1, 2, e)]),
+             array("B", [cast_hit, cast_not_enough_mp, cast_kill]))
+check.expect("Example 1: cast_many: e mutation", e.hp, 0)
+check.expect("Example 1: cast_many: c mutation", c.mp, 1)
+
+check.expect("Example 2: cast_many no casts", cast_many([]), array("B"))
+
+
+##Tests for cast_many:
+
+c = Character("Test", 1, 4, 0)
+e = Character("Test", 1, 0, 5)
+check.expect("Test 1: cast_many: Not enough MP and enemy defeated",
+             cast_many(iter([(c, 13, 10, e), (e, 1, 1, c), (e, 1, 1, e)])),
+             array("B", [cast_not_enough_mp | cast_already_defeated,
+                         cast_hit, cast_already_defeated]))
+check.expect("Test 1: cast_many: c mutation", c.hp, 3)
+check.expect("Test 1: cast_many: e mutation", e.mp, 4)
+
+cc = Character("Test", 1, 4, 5)
+ee = Character("Test", 1, 6, 6)
+c = Character("Test", 1, 4, 5)
+e = Character("Test", 1, 6, 6)
+casts = [(cc, 0, 1, ee), (cc, 5, 4, ee), (ee, 6, 9, cc), (cc, 0, 1, ee),
+         (ee, 1, 1, cc)]
+check.expect("Test 2: cast_many matches cast_spell", cast_many(casts),
+             array("B", [cast_hit, cast_hit, cast_kill, cast_kill,
+                         cast_not_enough_mp | cast_already_defeated]))
+check.set_print_exact("Enemy defeated", "Enemy defeated",
+                      "Not enough MP", "Enemy defeated")
+check.expect("Test 2: cast_spell for comparison",
+             list(map(lambda cast: cast[0].cast_spell(cast[1], cast[2],
+                                                      cast[3]),
+                      [(c, 0, 1, e), (c, 5, 4, e), (e, 6, 9, c),
+                       (c, 0, 1, e), (e, 1, 1, c)])),
+             [None] * 5)
+check.expect("Test 2: cast_many mutations match cast_spell",
+             [cc == c, ee == e], [True, True])
+
+
+##Examples for fingerprint and __hash__:
+
+c = Character("Test", 1, 4, 5)
+e = Character("Test", 1, 4, 5)
+check.expect("Example 1: fingerprint equal Characters",
+             c.fingerprint() == e.fingerprint(), True)
+check.expect("Example 1: hash is fingerprint", hash(c), c.fingerprint())
+check.expect("Example 2: set of Characters",
+             len({c, e, Character("C4", 1, 12, 13),
+                  Character("C4", 1, 12, 13)}), 2)
+
+
+##Tests for fingerprint and __hash__:
+
+c = Character("Test", 1, 4, 5)
+e = Character("Test", 1, 4, 5)
+old = c.fingerprint()
+e.fingerprint()
+c.cast_spell(3, 2, e)
+check.expect("Test 1: cast_spell touches caster",
+             c.fingerprint() == old, False)
+check.expect("Test 1: cast_spell touches enemy",
+             e.fingerprint() == old, False)
+check.expect("Test 1: __eq__ after cast_spell", c == e, False)
+
+c = Character("Test", 1, 4, 5)
+e = Character("Test", 1, 4, 5)
+e.fingerprint()
+e.level_up()
+c.level_up()
+check.expect("Test 2: level_up touches", c == e, True)
+check.expect("Test 2: level_up fingerprint", hash(c), hash(e))
+
+e = Character("E2", 20, 20, 10)
+f = Character("E2", 20, 20, 10)
+old = e.fingerprint()
+all_punch([Character("C1", 10, 10, 10)], e)
+check.expect("Test 3: all_punch touches enemy",
+             e.fingerprint() == old, False)
+check.expect("Test 3: __eq__ after all_punch", e == f, False)
+
+c = Character("Test", 1, 4, 5)
+c.fingerprint()
+c.hp = 1
+c.touch()
+check.expect("Test 4: touch after direct assignment",
+             c == Character("Test", 1, 4, 5), False)
+
+p4 = CharacterPool([Character("Fay", 12, 10, 11)])
+r = p4[0]
+old = r.fingerprint()
+p4.level_up()
+check.expect("Test 5: CharacterRow fingerprint follows pool",
+             r.fingerprint() == old, False)
+f = Character("Fay", 12, 10, 11)
+f.level_up()
+check.expect("Test 5: CharacterRow hash", hash(r), hash(f))
+
+check.expect("Test 6: dict keyed by Character",
+             {Character("A", 1, 1, 1): 1, Character("A", 1, 1, 1): 2},
+             {Character("A", 1, 1, 1): 2})
+
+
+##Examples for roster snapshots:
+
+check.expect("Example 1: padding multiple of 8", padding(8), 0)
+check.expect("Example 2: padding", padding(13), 3)
+
+roster_dir = tempfile.mkdtemp()
+roster_path = os.path.join(roster_dir, "world.roster")
+c = Character("Test", 1, 4, 5)
+e = Character("Jay", 11, 99, 97)
+c.cast_spell(3, 2, e)
+e.level_up(2)
+check.expect("Example 3: write_roster", write_roster(roster_path, [c, e]),
+             None)
+snapshot = open_roster(roster_path)
+check.expect("Example 3: open_roster len", len(snapshot), 2)
+check.expect("Example 3: open_roster characters",
+             [snapshot[0] == c, snapshot[-1] == e], [True, True])
+check.expect("Example 3: open_roster columns", list(snapshot.level), [1, 3])
+check.expect("Example 3: open_roster name", snapshot.name(1), "Jay")
+snapshot.close()
+
+
+##Tests for roster snapshots:
+
+check.expect("Test 1: write_roster empty", write_roster(roster_path, []),
+             None)
+with open_roster(roster_path) as snapshot:
+  check.expect("Test 1: open_roster empty", len(snapshot), 0)
+  check.expect("Test 1: to_pool empty", len(snapshot.to_pool()), 0)
+
+p5 = CharacterPool([Character("Fay", 12, 10, 11),
+                    Character("Zo\u00eb", 1, 15, 17),
+                    Character("", 3, 13, 15)])
+p5.level_up([False, True, True])
+write_roster(roster_path, p5)
+with open_roster(roster_path) as snapshot:
+  check.expect("Test 2: open_roster non-ASCII name", snapshot.name(1),
+               "Zo\u00eb")
+  check.expect("Test 2: open_roster empty name", snapshot.name(2), "")
+  pool = snapshot.to_pool()
+  check.expect("Test 2: to_pool names", pool.names, p5.names)
+  check.expect("Test 2: to_pool columns",
+               [pool.st, pool.hp, pool.max_hp, pool.mp, pool.max_mp,
+                pool.level],
+               [p5.st, p5.hp, p5.max_hp, p5.mp, p5.max_mp, p5.level])
+  check.expect("Test 2: to_pool copies", isinstance(pool.st, array), True)
+
+f = open(roster_path, "wb")
+f.write(b"not a roster at all, not at all")
+f.close()
+try:
+  open_roster(roster_path)
+  outcome = "opened"
+except RosterError:
+  outcome = "RosterError"
+check.expect("Test 3: open_roster bad file", outcome, "RosterError")
+
+os.remove(roster_path)
+os.rmdir(roster_dir)
+
+
+##Examples for replay:
+
+replay_dir = tempfile.mkdtemp()
+log_path = os.path.join(replay_dir, "battle.jsonl")
+checkpoint_dir = os.path.join(replay_dir, "checkpoints")
+f = open(log_path, "w")
+check.expect("Example 1: log_action",
+             log_action(f, {"op": "new", "name": "C1", "st": 10,
+                            "max_hp": 10, "max_mp": 10}), None)
+log_action(f, {"op": "new", "name": "C3", "st": 20, "max_hp": 20,
+               "max_mp": 10})
+log_action(f, {"op": "new", "name": "E2", "st": 20, "max_hp": 20,
+               "max_mp": 10})
+log_action(f, {"op": "cast_spell", "caster": 0, "cost": 3, "damage": 5,
+               "enemy": 2})
+log_action(f, {"op": "level_up", "id": 2, "n": 2})
+log_action(f, {"op": "all_punch", "players": [0, 1], "enemy": 2})
+f.write('{"op": "level_up", "id": 0')
+f.close()
+
+check.expect("Example 2: read_actions skips unfinished line",
+             len(list(read_actions(log_path))), 6)
+
+w1 = Character("C1", 10, 10, 10)
+w2 = Character("C3", 20, 20, 10)
+w3 = Character("E2", 20, 20, 10)
+w1.cast_spell(3, 5, w3)
+w3.level_up(2)
+all_punch([w1, w2], w3)
+world, stats = replay(log_path)
+check.expect("Example 3: replay world", world, [w1, w2, w3])
+check.expect("Example 3: replay actions", stats.actions, 6)
+
+
+##Tests for replay:
+
+world, stats = replay(log_path, checkpoint_dir, 2, stop=5)
+check.expect("Test 1: replay stop", stats.actions, 5)
+check.expect("Test 1: replay checkpoints saved",
+             [len(os.listdir(checkpoint_dir)),
+              list(map(lambda entry: entry["actions"],
+                       replay_module.read_checkpoints(checkpoint_dir)))],
+             [3, [2, 4]])
+
+world, stats = replay(log_path, checkpoint_dir, 2)
+check.expect("Test 2: replay resumes from checkpoint", stats.replayed, 2)
+check.expect("Test 2: replay resumed world", world, [w1, w2, w3])
+check.expect("Test 2: replay offset",
+             stats.offset, list(read_actions(log_path))[-1][0])
+
+world, stats = replay(log_path, checkpoint_dir, 2, stop=3)
+check.expect("Test 3: replay resumes from earlier checkpoint",
+             [stats.actions, stats.replayed], [3, 1])
+check.expect("Test 3: replay world after 3 actions",
+             world, [Character("C1", 10, 10, 10), Character("C3", 20, 20, 10),
+                     Character("E2", 20, 20, 10)])
+
+try:
+  apply_action([], {"op": "fly"})
+  outcome = "applied"
+except ValueError:
+  outcome = "ValueError"
+check.expect("Test 4: apply_action unknown action", outcome, "ValueError")
+
+other_log_path = os.path.join(replay_dir, "other.jsonl")
+with open(log_path) as f:
+  text = f.read()
+with open(other_log_path, "w") as f:
+  f.write(text.replace('"C1"', '"C2"'))
+world, stats = replay(other_log_path, checkpoint_dir, 2)
+check.expect("Test 5: replay ignores checkpoints of another log",
+             [stats.replayed, world[0].name], [6, "C2"])
+world, stats = replay(log_path, checkpoint_dir, 2)
+check.expect("Test 5: replay keeps checkpoints of each log",
+             [stats.replayed, world], [0, [w1, w2, w3]])
+os.replace(other_log_path, log_path)
+world, stats = replay(log_path, checkpoint_dir, 2)
+check.expect("Test 6: replay resumes a replaced log from its own checkpoint",
+             [stats.replayed, world[0].name], [0, "C2"])
+
+for name in os.listdir(checkpoint_dir):
+  os.remove(os.path.join(checkpoint_dir, name))
+os.rmdir(checkpoint_dir)
+os.remove(log_path)
+os.rmdir(replay_dir)
+
+
+##Examples for BattleServer:
+
+async def run_commands(server, commands):
+  return await asyncio.gather(*map(server.submit, commands))
+
+battle = BattleServer(0)
+replies = asyncio.run(run_commands(battle, [
+  {"op": "new", "name": "C1", "st": 10, "max_hp": 10, "max_mp": 10},
+  {"op": "new", "name": "E2", "st": 20, "max_hp": 20, "max_mp": 10},
+  {"tag": "a", "op": "cast_spell", "caster": 0, "cost": 3, "damage": 5,
+   "enemy": 1},
+  {"tag": "b", "op": "cast_spell", "caster": 0, "cost": 30, "damage": 5,
+   "enemy": 1},
+  {"op": "all_punch", "players": [0], "enemy": 1},
+  {"op": "get", "id": 0}]))
+check.expect("Example 1: BattleServer replies", replies,
+             [{"tag": None, "result": 0}, {"tag": None, "result": 1},
+              {"tag": "a", "result": cast_hit},
+              {"tag": "b", "result": cast_not_enough_mp},
+              {"tag": None, "result": 0},
+              {"tag": None, "result": {"name": "C1", "st": 12, "hp": 12,
+                                      "max_hp": 12, "mp": 9, "max_mp": 12,
+                                      "level": 2}}])
+
+
+##Tests for BattleServer:
+
+replies = asyncio.run(run_commands(battle, [
+  {"tag": 1, "op": "cast_spell", "caster": 0, "cost": 1, "damage": 1,
+   "enemy": 7},
+  {"tag": 2, "op": "cast_spell", "caster": 0, "cost": 1, "damage": 1,
+   "enemy": 1},
+  {"tag": 3, "op": "fly"},
+  {"tag": 4, "op": "level_up", "id": 4}]))
+check.expect("Test 1: BattleServer bad cast only fails itself",
+             [replies[0]["tag"], "error" in replies[0], replies[1]],
+             [1, True, {"tag": 2, "result": cast_already_defeated}])
+check.expect("Test 2: BattleServer unknown op",
+             replies[2],
+             {"tag": 3, "error": "ValueError: unknown action 'fly'"})
+check.expect("Test 3: BattleServer bad id", "error" in replies[3], True)
+check.expect("Test 4: BattleServer world", len(battle.world), 2)
+replies = asyncio.run(run_commands(battle, [
+  {"tag": 5, "op": "cast_spell", "caster": 0, "cost": 1, "damage": 1,
+   "enemy": 0},
+  {"tag": 6, "op": "cast_spell", "caster": 0, "cost": "x", "damage": 1,
+   "enemy": 0}]))
+check.expect("Test 5: BattleServer bad cost only fails itself",
+             [replies[0], replies[1]["tag"], "error" in replies[1],
+              battle.world[0].mp], [{"tag": 5, "result": cast_hit}, 6,
+                                    True, 8])
+
+async def half_close(server):
+  listener = await start(server, 0)
+  port = listener.sockets[0].getsockname()[1]
+  reader, writer = await connect(port)
+  writer.write(b'{"tag": 1, "op": "get", "id": 0}\n')
+  writer.write_eof()
+  answer = await reader.readline()
+  writer.close()
+  listener.close()
+  await listener.wait_closed()
+  return json.loads(answer)
+
+check.expect("Test 6: BattleServer replies after half-close",
+             asyncio.run(half_close(BattleServer(0.05)))["tag"], 1)
+
+
+##Examples for simulate:
+
+serial = simulate(116, 300, 1, shard_size=50)
+check.expect("Example 1: simulate encounters", serial["encounters"], 300)
+check.expect("Example 1: simulate same seed, same result",
+             simulate(116, 300, 1, shard_size=50), serial)
+
+
+##Tests for simulate:
+
+check.expect("Test 2: simulate different seed",
+             simulate(117, 300, 1) == serial, False)
+tuned = simulate(116, 300, 1, increase_factor=0.5, punch_factor_st=3)
+check.expect("Test 3: simulate constants change results",
+             summary(tuned)["win_rate"] > summary(serial)["win_rate"], True)
+check.expect("Test 3: simulate restores constants",
+             [role_playing_game.increase_factor,
+              role_playing_game.punch_factor_st], [0.1, 2])
+check.expect("Test 4: simulate no encounters",
+             summary(simulate(116, 0, 1)),
+             {"encounters": 0, "win_rate": 0.0,
+              "average_levels_gained": 0.0, "remaining_hp": {}})
+
+
+##Examples for profiling:
+
+original_cast_spell = Character.cast_spell
+original_all_punch = role_playing_game.all_punch
+old_sink = set_event_sink(NullSink())
+profiling.reset()
+profiling.enable()
+p1 = Character("P1", 10, 10, 10)
+p2 = Character("P2", 1, 10, 10)
+q1 = Character("Q1", 10, 25, 10)
+p1.cast_spell(3, 5, q1)
+p1.cast_spell(30, 5, q1)
+p1.cast_spell(3, 50, q1)
+p1.cast_spell(3, 5, q1)
+all_punch([p1, p2], Character("Q2", 1, 100, 1))
+all_punch([p1, p2], Character("Q3", 1, 5, 1))
+profiling.disable()
+set_event_sink(old_sink)
+profile = profiling.snapshot()
+check.expect("Example 1: profiling calls",
+             [profile["cast_spell"]["calls"], profile["all_punch"]["calls"],
+              profile["level_up"]["calls"]], [4, 2, 2])
+check.expect("Example 1: profiling cast_spell branches",
+             profile["cast_spell"]["branches"],
+             {"hit": 1, "not_enough_mp": 1, "kill": 1,
+              "already_defeated": 1})
+check.expect("Example 1: profiling all_punch branches",
+             profile["all_punch"]["branches"], {"hit": 1, "kill": 1})
+
+
+##Tests for profiling:
+
+check.expect("Test 1: profiling disable restores the originals",
+             [Character.cast_spell is original_cast_spell,
+              role_playing_game.all_punch is original_all_punch,
+              replay_module.all_punch is original_all_punch,
+              all_punch is original_all_punch, profiling.enabled()],
+             [True, True, True, True, False])
+check.expect("Test 2: profiling histogram counts every call",
+             sum(profile["cast_spell"]["histogram"].values()), 4)
+check.expect("Test 3: profiling level_up counts levels",
+             profile["level_up"]["branches"], {"levels": 2})
+check.expect("Test 4: profiling nothing recorded while disabled",
+             [p1.level_up(), profiling.snapshot()["level_up"]["calls"]],
+             [None, 2])
+prometheus = profiling.prometheus_text().splitlines()
+check.expect("Test 5: prometheus calls",
+             'rpg_calls_total{method="cast_spell"} 4' in prometheus, True)
+check.expect("Test 5: prometheus branches",
+             'rpg_branch_total{method="all_punch",branch="kill"} 1'
+             in prometheus, True)
+check.expect("Test 5: prometheus histogram count",
+             ['rpg_latency_seconds_bucket{method="level_up",le="+Inf"} 2'
+              in prometheus,
+              'rpg_latency_seconds_count{method="level_up"} 2' in prometheus],
+             [True, True])
+profiling.enable()
+profiling.enable()
+profiling.disable()
+check.expect("Test 6: profiling enable twice, disable once",
+             Character.cast_spell is original_cast_spell, True)
+profiling.reset()
+check.expect("Test 7: profiling reset", profiling.snapshot()["level_up"],
+             {"calls": 0, "branches": {}, "latency_ns": 0, "histogram": {}})
+
+
+##Examples for render_roster:
+
+rendered = io.StringIO()
+render_roster([Character("Fay", 12, 10, 11), Character("E7", 100, 58, 20)],
+              rendered)
+check.expect("Example 1: render_roster", rendered.getvalue(),
+             ("Fay\nLevel: 1\nStrength: 12\nHP: 10/10\nMP: 11/11\n"
+              "E7\nLevel: 1\nStrength: 100\nHP: 58/58\nMP: 20/20\n"))
+rendered = io.StringIO()
+render_roster([], rendered)
+check.expect("Example 2: render_roster empty", rendered.getvalue(), "")
+
+
+##Tests for render_roster:
+
+r1 = Character("R1", 10, 10, 10)
+r2 = Character("R2", 1, 10, 10)
+check.set_print_exact(str(r1), str(r2))
+check.expect("Test 1: render_roster matches print",
+             render_roster([r1, r2], sys.stdout), None)
+r1.cast_spell(3, 4, r2)
+check.expect("Test 2: render_roster after cast_spell", str(r2),
+             "R2\nLevel: 1\nStrength: 1\nHP: 6/10\nMP: 10/10")
+r1.level_up()
+check.expect("Test 3: render_roster after level_up", str(r1),
+             "R1\nLevel: 2\nStrength: 12\nHP: 12/12\nMP: 9/12")
+r1.hp = 1
+r1.touch()
+check.expect("Test 4: render_roster after touch", str(r1),
+             "R1\nLevel: 2\nStrength: 12\nHP: 1/12\nMP: 9/12")
+p5 = CharacterPool([Character("Fay", 12, 10, 11)])
+str(p5[0])
+p5.level_up()
+rendered = io.StringIO()
+render_roster([p5[0]], rendered)
+check.expect("Test 5: render_roster CharacterRow is not cached",
+             rendered.getvalue(),
+             "Fay\nLevel: 2\nStrength: 14\nHP: 12/12\nMP: 13/13\n")
+
+
+##Examples for Party:
+
+party = Party([Character("C1", 10, 10, 10), Character("C2", 1, 10, 10),
+               Character("C3", 20, 20, 10)])
+copies = [Character("C1", 10, 10, 10), Character("C2", 1, 10, 10),
+          Character("C3", 20, 20, 10)]
+check.expect("Example 1: Party total_st", party.total_st, 31)
+enemy_a = Character("E3", 20, 100, 10)
+enemy_b = Character("E3", 20, 100, 10)
+party.punch(enemy_a)
+all_punch(copies, enemy_b)
+check.expect("Example 1: Party punch hit",
+             [party.members == copies, enemy_a == enemy_b, enemy_a.hp],
+             [True, True, 38])
+enemy_a = Character("E2", 20, 20, 10)
+enemy_b = Character("E2", 20, 20, 10)
+party.punch(enemy_a)
+all_punch(copies, enemy_b)
+check.expect("Example 2: Party punch kill",
+             [party.members == copies, enemy_a == enemy_b, enemy_a.hp,
+              party.total_st],
+             [True, True, 0, 37])
+
+
+##Tests for Party:
+
+party_events = RingBufferSink(100)
+punch_events = RingBufferSink(100)
+old_sink = set_event_sink(party_events)
+party.punch(Character("E8", 100, 10, 20))
+set_event_sink(punch_events)
+all_punch(copies, Character("E8", 100, 10, 20))
+set_event_sink(old_sink)
+check.expect("Test 1: Party punch events match all_punch",
+             list(map(lambda event: [event.kind, event.amount],
+                      party_events.drain())),
+             list(map(lambda event: [event.kind, event.amount],
+                      punch_events.drain())))
+check.expect("Test 2: Party punch levels match all_punch",
+             [party.members == copies, party.total_st],
+             [True, sum(map(lambda c: c.st, copies))])
+newcomer = Character("C4", 1, 12, 13)
+party.join(newcomer)
+check.expect("Test 3: Party join", [len(party), party.total_st], [4, 44])
+party.leave(newcomer)
+check.expect("Test 4: Party leave", [len(party), party.total_st], [3, 43])
+party.join(newcomer)
+try:
+  party.leave(Character("C4", 1, 12, 13))
+  left = True
+except ValueError:
+  left = False
+check.expect("Test 5: Party leave needs the same object",
+             [left, len(party)], [False, 4])
+party.leave(newcomer)
+party.members[0].st = 1
+party.members[0].touch()
+party.touch()
+check.expect("Test 6: Party touch", party.total_st, 30)
+empty = Party()
+enemy_a = Character("E1", 2, 5, 10)
+empty.punch(enemy_a)
+check.expect("Test 7: Party empty punch", [enemy_a.hp, empty.total_st],
+             [5, 0])
+shared = Character("S1", 10, 10, 10)
+lone = Character("S2", 5, 10, 10)
+first = Party([shared, lone])
+second = Party([shared])
+second.punch(Character("E1", 2, 5, 10))
+all_punch([shared], Character("E1", 2, 5, 10))
+lone.level_up_to(3)
+with Transaction() as move:
+  first.punch(Character("E1", 2, 5, 10))
+  move.rollback()
+check.expect("Test 8: Party total_st follows members levelled elsewhere",
+             [first.total_st, second.total_st],
+             [shared.st + lone.st, shared.st])
+enemy_a = Character("E9", 2, 100, 10)
+enemy_b = Character("E9", 2, 100, 10)
+first.punch(enemy_a)
+all_punch([Character("S1", shared.st, 10, 10),
+           Character("S2", lone.st, 10, 10)], enemy_b)
+check.expect("Test 8: Party punch after members levelled elsewhere",
+             enemy_a.hp, enemy_b.hp)
+first.join(shared)
+shared.level_up()
+first.leave(shared)
+check.expect("Test 9: Party member twice",
+             [first.total_st, shared.observers() == [first, second]],
+             [shared.st + lone.st, True])
+second.leave(shared)
+first.leave(shared)
+check.expect("Test 10: Party leave forgets the Party",
+             [first.total_st, shared.observers()], [lone.st, []])
+twice = Character("D1", 10, 10, 10)
+once = Character("D2", 20, 10, 10)
+pair = Party([twice, once, twice])
+other = Party([once])
+ranked = World([twice, once])
+pair.level_up()
+check.expect("Test 11: Party level_up",
+             [twice.level, once.level, pair.total_st, other.total_st,
+              ranked.top("st", 1)[0] is max(pair.members,
+                                            key=lambda c: c.st)],
+             [3, 2, 2 * twice.st + once.st, once.st, True])
+pair.punch(Character("E1", 2, 5, 10))
+check.expect("Test 12: Party punch kill levels up in bulk",
+             [twice.level, once.level, pair.total_st,
+              ranked.top("st", 1)[0] is max(pair.members,
+                                            key=lambda c: c.st)],
+             [5, 3, 2 * twice.st + once.st, True])
+
+
+##Examples for all_punch_detailed:
+
+raid = [Character("C1", 10, 10, 10), Character("C2", 1, 10, 10),
+        Character("C3", 20, 20, 10)]
+copies = [Character("C1", 10, 10, 10), Character("C2", 1, 10, 10),
+          Character("C3", 20, 20, 10)]
+enemy_a = Character("E2", 20, 20, 10)
+enemy_b = Character("E2", 20, 20, 10)
+check.expect("Example 1: all_punch_detailed kill",
+             all_punch_detailed(raid, enemy_a),
+             PunchResult(True, 0, 42, range(0, 1)))
+all_punch(copies, enemy_b)
+check.expect("Example 1: all_punch_detailed mutates as all_punch",
+             [raid == copies, enemy_a == enemy_b], [True, True])
+enemy_a = Character("E8", 100, 500, 20)
+check.expect("Example 2: all_punch_detailed survives",
+             all_punch_detailed(raid, enemy_a),
+             PunchResult(False, None, 0, range(0, 3)))
+
+
+##Tests for all_punch_detailed:
+
+enemy_a = Character("E3", 20, 27, 10)
+check.expect("Test 1: all_punch_detailed killer in the middle",
+             all_punch_detailed(raid, enemy_a),
+             PunchResult(True, 1, 47, range(0, 2)))
+check.expect("Test 2: all_punch_detailed already defeated",
+             all_punch_detailed(raid, enemy_a),
+             PunchResult(True, None, 86, range(0)))
+check.expect("Test 2: all_punch_detailed already defeated levels up",
+             raid[0].level, 4)
+enemy_a = Character("E3", 20, 24, 10)
+check.expect("Test 3: all_punch_detailed exact kill",
+             all_punch_detailed(raid, enemy_a).killer, 0)
+check.expect("Test 4: all_punch_detailed no players",
+             all_punch_detailed([], Character("E1", 2, 5, 10)),
+             PunchResult(False, None, 0, range(0)))
+big_raid = list(map(lambda i: Character("R", 1 + i % 7, 10, 10),
+                    range(100000)))
+enemy_a = Character("Boss", 1, 500000, 1)
+old_sink = set_event_sink(NullSink())
+result = all_punch_detailed(big_raid, enemy_a)
+set_event_sink(old_sink)
+dealt = 0
+killer = None
+for i in range(len(big_raid)):
+  dealt = dealt + 2 * (1 + i % 7)
+  if killer is None and dealt >= 500000:
+    killer = i
+check.expect("Test 5: all_punch_detailed large raid",
+             [result.killer, result.overkill, len(result.contributors),
+              enemy_a.hp], [killer, dealt - 500000, killer + 1, 0])
+
+
+##Examples for World:
+
+w1 = Character("C1", 10, 10, 10)
+w2 = Character("C4", 1, 12, 13)
+w3 = Character("C3", 20, 20, 10)
+w4 = Character("C1", 10, 30, 10)
+world = World([w1, w2, w3, w4])
+check.expect("Example 1: World lowest_hp", world.lowest_hp() is w1, True)
+check.expect("Example 1: World top", world.top("st", 2) == [w3, w1], True)
+check.expect("Example 1: World named",
+             list(map(lambda c: c is w1 or c is w4, world.named("C1"))),
+             [True, True])
+check.expect("Example 1: World all_defeated", world.all_defeated(), [])
+
+
+##Tests for World:
+
+old_sink = set_event_sink(NullSink())
+w3.cast_spell(3, 10, w1)
+set_event_sink(old_sink)
+check.expect("Test 1: World cast_spell kill",
+             [world.all_defeated() == [w1], world.lowest_hp() is w2],
+             [True, True])
+w3.cast_spell(3, 11, w2)
+check.expect("Test 2: World cast_spell hit", world.lowest_hp() is w2, True)
+old_sink = set_event_sink(NullSink())
+all_punch([w2], Character("E1", 2, 2, 10))
+set_event_sink(old_sink)
+check.expect("Test 3: World all_punch levels up",
+             [world.top("level", 1) == [w2], world.top("st", 4)[-1] is w2],
+             [True, True])
+w1.level_up(3)
+check.expect("Test 4: World level_up",
+             world.top("level", 2) == [w1, w2], True)
+check.expect("Test 4: World top more than there are",
+             len(world.top("level", 10)), 4)
+w1.hp = 5
+w1.touch()
+check.expect("Test 5: World touch revives",
+             [world.all_defeated(), world.lowest_hp() is w2], [[], True])
+world.remove(w2)
+check.expect("Test 6: World remove",
+             [len(world), w2 in world, world.named("C4"),
+              world.lowest_hp() is w1], [3, False, [], True])
+check.expect("Test 6: World remove leaves no registry",
+             [w2.level_up(), w2.observers()], [None, []])
+try:
+  World([w1])
+  added = True
+except ValueError:
+  added = False
+check.expect("Test 7: World add twice", added, False)
+try:
+  world.top("hp", 1)
+  ranked = True
+except ValueError:
+  ranked = False
+check.expect("Test 8: World top by hp", ranked, False)
+crowd = list(map(lambda i: Character("N{0}".format(i % 10), 1 + i % 13,
+                                     100 + i % 17, 10), range(200)))
+crowd_world = World(crowd)
+for i in range(2000):
+  crowd[i % 200].cast_spell(1, 1, crowd[(i * 7) % 200])
+living = list(filter(lambda c: c.hp > 0, crowd))
+check.expect("Test 9: World lowest_hp matches a scan",
+             crowd_world.lowest_hp().hp, min(map(lambda c: c.hp, living)))
+check.expect("Test 9: World heaps stay compact",
+             max(map(len, crowd_world._heaps.values())) <= 2 * 200 + 16, True)
+check.expect("Test 10: World named after rename",
+             [w4.name, world.named("C1") == [w1, w4]], ["C1", True])
+w4.name = "C9"
+w4.touch()
+check.expect("Test 10: World named after rename",
+             [world.named("C1") == [w1], world.named("C9") == [w4]],
+             [True, True])
+k1 = Character("K1", 10, 10, 10)
+k2 = Character("K2", 1, 10, 10)
+k3 = Character("K3", 1, 15, 10)
+killed_world = World([k1, k2, k3])
+cast_many([(k1, 1, 15, k2)])
+check.expect("Test 11: World cast_many kill",
+             [killed_world.all_defeated() == [k2],
+              killed_world.lowest_hp() is k1], [True, True])
+old_sink = set_event_sink(NullSink())
+all_punch([k1], k3)
+set_event_sink(old_sink)
+check.expect("Test 12: World all_punch hp is clamped",
+             [killed_world._records[id(k3)][2],
+              k3 in killed_world.defeated.values()],
+             [0, True])
+pair_a = Character("A", 1, 100, 10)
+pair_b = Character("B", 1, 100, 10)
+pair = World([pair_a, pair_b])
+for i in range(19):
+  cast_many([(pair_a, 0, 1, pair_b)])
+check.expect("Test 13: World keeps an entry pushed while compacting",
+             [pair.lowest_hp() is pair_b, pair_b.hp,
+              len(pair._heaps["hp"]) <= 2 * len(pair) + 16],
+             [True, 81, True])
+pair_party = Party([pair_b])
+copies = [copy.copy(pair_b), copy.deepcopy(pair_b),
+          pickle.loads(pickle.dumps(pair_b))]
+check.expect("Test 14: World copies of a member are not members",
+             [copies == [pair_b] * 3,
+              list(map(lambda c: [c.observers(), c in pair], copies))],
+             [True, [[[], False]] * 3])
+for c in copies:
+  cast_many([(c, 0, 90, c)])
+check.expect("Test 14: World copies can be mutated alone",
+             [pair.all_defeated(), pair_b.hp, pair_party.total_st],
+             [[], 81, 1])
+rows = CharacterPool([pair_a])
+row_copies = [copy.copy(rows[0]), copy.deepcopy(rows[0])]
+rows[0].hp = 5
+check.expect("Test 15: World copies of a CharacterRow",
+             list(map(lambda row: row.hp, row_copies)), [5, 100])
+
+
+##Examples for Transaction:
+
+t1 = Character("T1", 10, 10, 10)
+t2 = Character("T2", 1, 10, 10)
+with Transaction() as move:
+  t1.cast_spell(3, 4, t2)
+  move.rollback()
+check.expect("Example 1: Transaction rollback",
+             [t1 == Character("T1", 10, 10, 10),
+              t2 == Character("T2", 1, 10, 10)], [True, True])
+with Transaction():
+  t1.cast_spell(3, 4, t2)
+check.expect("Example 2: Transaction commit", [t1.mp, t2.hp], [7, 6])
+
+
+##Tests for Transaction:
+
+old_sink = set_event_sink(NullSink())
+before = [str(t1), str(t2)]
+with Transaction() as outer:
+  t1.level_up(2)
+  with Transaction() as inner:
+    all_punch([t1], t2)
+    inner.rollback()
+  check.expect("Test 1: Transaction inner rollback",
+               [t2.hp, t1.level], [6, 3])
+  with Transaction():
+    all_punch([t1], t2)
+  check.expect("Test 2: Transaction inner commit",
+               [t2.hp, t1.level], [0, 4])
+  outer.rollback()
+check.expect("Test 3: Transaction outer rollback undoes inner commit",
+             [str(t1), str(t2)], before)
+try:
+  with Transaction():
+    t1.cast_spell(1, 100, t2)
+    raise ValueError("lookahead failed")
+except ValueError:
+  pass
+check.expect("Test 4: Transaction rolls back on error", str(t2), before[1])
+watched = World([t1, t2])
+with Transaction() as move:
+  t1.cast_spell(1, 100, t2)
+  check.expect("Test 5: Transaction with World, inside",
+               watched.all_defeated() == [t2], True)
+  move.rollback()
+check.expect("Test 5: Transaction with World, after rollback",
+             [watched.all_defeated(), watched.lowest_hp() is t2], [[], True])
+team = Party([Character("P1", 10, 10, 10)])
+with Transaction() as move:
+  team.punch(Character("E1", 2, 5, 10))
+  cast_many([(t1, 1, 1, t2)])
+  move.rollback()
+check.expect("Test 6: Transaction Party and cast_many",
+             [team.total_st, team.members[0].level, str(t2)],
+             [10, 1, before[1]])
+outer = Transaction()
+inner = Transaction()
+outer.__enter__()
+inner.__enter__()
+try:
+  outer.commit()
+  ended = True
+except ValueError:
+  ended = False
+inner.commit()
+outer.commit()
+check.expect("Test 7: Transaction ends innermost first",
+             [ended, role_playing_game._journal], [False, []])
+before = [str(t1), str(t2)]
+try:
+  with Transaction():
+    t1.cast_spell(1, 1, t2)
+    Transaction().__enter__()
+    t2.cast_spell(1, 1, t1)
+    raise KeyError("lookahead failed")
+except KeyError:
+  failed = True
+except ValueError:
+  failed = False
+check.expect("Test 8: Transaction left open inside one that raises",
+             [failed, role_playing_game._journal, [str(t1), str(t2)]],
+             [True, [], before])
+with Transaction() as move:
+  Transaction().__enter__()
+  t1.cast_spell(1, 1, t2)
+check.expect("Test 9: Transaction left open inside one that ends",
+             [role_playing_game._journal, move.entries, str(t2) == before[1]],
+             [[], [], False])
+sizes = []
+old_touch = Party.touch
+Party.touch = lambda party: sizes.append(len(party))
+big_team = Party(map(lambda i: Character("P", 1, 10, 10), range(1000)))
+with Transaction() as move:
+  big_team.punch(Character("E1", 2, 5, 10))
+  move.rollback()
+Party.touch = old_touch
+check.expect("Test 10: Transaction rollback does not recompute Parties",
+             [sizes, big_team.total_st, big_team.members[0].level],
+             [[], 1000, 1])
+set_event_sink(old_sink)
+
+##Tests for check.collect and check.run_collected:
+def write_text(filename, text):
+  '''
+  Writes text to the file called filename and returns len(text).
+
+  Effects: Writes to a file
+
+  write_text: Str Str -> Nat
+  '''
+  with open(filename, "w") as f:
+    return f.write(text)
+
+report = collected_report(plain_tests, 1)
+check.expect("Test 1: collect runs in order",
+             [report.count("PASSED"), report.count("FAILED"),
+              report.index("c1") < report.index("c2") < report.index("c4")],
+             [4, 1, True])
+collect_dir = tempfile.mkdtemp()
+collect_files = list(map(lambda name: os.path.join(collect_dir, name),
+                         ["out1", "out2", "expected"]))
+write_text(collect_files[2], "done\n")
+def file_tests():
+  check.set_file(collect_files[0], collect_files[2])
+  check.expect("f1", write_text(collect_files[0], "done\n"), 5)
+  check.set_file(collect_files[1], collect_files[2])
+  check.expect("f2", write_text(collect_files[1], "done\n"), 5)
+check.set_file_watch(collect_dir)
+report = collected_report(file_tests, 1)
+check.set_file_watch()
+check.expect("Test 3: collect lists files when the call is made",
+             [report.count("PASSED"), "out2" in report], [2, False])
+list(map(os.remove, collect_files[:2]))
+def deferred_file_tests():
+  check.set_file(collect_files[0], collect_files[2])
+  check.expect("d1", check.deferred(write_text, collect_files[0], "done\n"),
+               5)
+  check.set_file(collect_files[1], collect_files[2])
+  check.expect("d2", check.deferred(write_text, collect_files[1], "done\n"),
+               5)
+check.set_file_watch(collect_dir)
+report = collected_report(deferred_file_tests, 1)
+check.set_file_watch()
+check.expect("Test 4: collect lists files when a deferred call is run",
+             [report.count("PASSED"), "created" in report], [2, False])
+def limited_tests():
+  check.set_screen_limit(3)
+  check.set_screen("abc")
+  check.expect("l1", check.deferred(print, "abcdef"), None)
+  check.set_screen_limit(None)
+report = collected_report(limited_tests, 1)
+check.expect("Test 5: collect keeps the settings of each test",
+             "l1: screen output truncated" in report, True)
+
+list(map(os.remove, collect_files))
+os.rmdir(collect_dir)
+
+
+
+##Tests for check.set_file_watch:
+
+watch_dir = tempfile.mkdtemp()
+watch_sub = os.path.join(watch_dir, "sub")
+os.mkdir(watch_sub)
+def in_watch_dir(*names):
+  '''
+  Returns the path of the file called names in watch_dir.
+
+  in_watch_dir: Str ... -> Str
+  '''
+  return os.path.join(watch_dir, *names)
+write_text(in_watch_dir("expected"), "done\n")
+write_text(in_watch_dir("old.txt"), "old\n")
+def watched_test(*extra):
+  '''
+  Returns a function that tests writing "done" to the file out in
+  watch_dir with check.set_file, writing each (name, text) of extra
+  as well.
+
+  watched_test: (list Str Str) ... -> (None -> Any)
+  '''
+  def tests():
+    check.set_file(in_watch_dir("out"), in_watch_dir("expected"))
+    check.expect("w", [write_text(in_watch_dir("out"), "done\n")] +
+                 list(map(lambda file: write_text(file[0], file[1]), extra)),
+                 [5] + list(map(lambda file: len(file[1]), extra)))
+  return tests
+check.set_file_watch(watch_dir)
+report = collected_report(watched_test([in_watch_dir("old.txt"), "new\n"]), 1)
+check.expect("Test 1: set_file_watch reports a file rewritten in place",
+             [report.count("PASSED"), "modified: old.txt" in report,
+              "created: old.txt" in report],
+             [1, True, False])
+check.set_file_watch(watch_dir, "*.txt")
+report = collected_report(watched_test([in_watch_dir("new.log"), "log\n"],
+                                       [in_watch_dir("new.txt"), "txt\n"]),
+                          1)
+check.expect("Test 2: set_file_watch with a glob",
+             ["new.log" in report, "created: new.txt" in report],
+             [False, True])
+check.set_file_watch(watch_sub)
+report = collected_report(watched_test([in_watch_dir("outside"), "x\n"],
+                                       [in_watch_dir("sub", "inside"), "x\n"]),
+                          1)
+check.expect("Test 3: set_file_watch scoped to a directory",
+             ["outside" in report, "created: inside" in report],
+             [False, True])
+check.set_file_watch(watch_dir)
+report = collected_report(watched_test([in_watch_dir("sub", "more"), "x\n"]),
+                          1)
+check.expect("Test 4: set_file_watch ignores changes inside subdirectories",
+             ["sub" in report, report.count("PASSED")], [False, 1])
+check.set_file_watch()
+
+for name in os.listdir(watch_sub):
+  os.remove(in_watch_dir("sub", name))
+os.rmdir(watch_sub)
+for name in os.listdir(watch_dir):
+  os.remove(in_watch_dir(name))
+os.rmdir(watch_dir)
+
+
+##Tests for check.set_screen_limit:
+
+def check_report(tests):
+  '''
+  Returns what check prints while tests() runs.
+
+  Effects: Mutates check while running
+
+  check_report: (None -> Any) -> Str
+  '''
+  old_stdout = check.backup_stdout
+  check.backup_stdout = io.StringIO()
+  try:
+    tests()
+    return check.backup_stdout.getvalue()
+  finally:
+    check.backup_stdout = old_stdout
+    sys.stdout = old_stdout
+
+def long_screen_tests():
+  check.set_screen("x")
+  check.expect("s1", print("x" * 30), None)
+  check.set_screen("y")
+  check.expect("s2", print("y" * 5), None)
+check.set_screen_limit(10)
+report = check_report(long_screen_tests)
+collected_text = collected_report(long_screen_tests, 1)
+check.set_screen_limit(None)
+check.expect("Test 1: set_screen_limit truncates output",
+             ["s1: screen output truncated; 21 characters were not kept"
+              in report, "x" * 11 in report, "yyyyy" in report],
+             [True, False, True])
+check.expect("Test 2: set_screen_limit only reports truncated tests",
+             report.count("truncated"), 1)
+check.expect("Test 3: set_screen_limit when collecting", collected_text,
+             report)
+check.expect("Test 4: set_screen_limit None keeps all output",
+             "x" * 30 in check_report(long_screen_tests), True)
+
+
+##Tests for check.set_file_mismatch_limit:
+
+mismatch_dir = tempfile.mkdtemp()
+mismatch_files = list(map(lambda name: os.path.join(mismatch_dir, name),
+                          ["got", "expected", "short"]))
+write_text(mismatch_files[0], "".join(map("a{0}\n".format, range(20))))
+write_text(mismatch_files[1], "".join(map("b{0}\n".format, range(20))))
+write_text(mismatch_files[2], "".join(map("b{0}\n".format, range(10))))
+def mismatch_tests(expected_file):
+  '''
+  Returns a function that tests mismatch_files[0] against
+  expected_file with check.set_file.
+
+  mismatch_tests: Str -> (None -> Any)
+  '''
+  def tests():
+    check.set_file(mismatch_files[0], expected_file)
+    check.expect("m", None, None)
+  return tests
+check.set_file_watch(mismatch_dir)
+check.set_file_mismatch_limit(3)
+limited = check_report(mismatch_tests(mismatch_files[1]))
+shorter = check_report(mismatch_tests(mismatch_files[2]))
+check.set_file_mismatch_limit(None)
+unlimited = check_report(mismatch_tests(mismatch_files[1]))
+check.set_file_watch()
+check.expect("Test 1: set_file_mismatch_limit stops early",
+             ["do not match: 1, 2, 3\n" in limited,
+              "stopped comparing after 3 mismatched lines" in limited],
+             [True, True])
+check.expect("Test 2: set_file_mismatch_limit does not read on",
+             ["same number of lines" in shorter,
+              "stopped comparing" in shorter],
+             [False, True])
+check.expect("Test 3: set_file_mismatch_limit None compares every line",
+             ["do not match: " + ", ".join(map(str, range(1, 21))) + "\n"
+              in unlimited, "stopped comparing" in unlimited],
+             [True, False])
+
+list(map(os.remove, mismatch_files))
+os.rmdir(mismatch_dir)
+
+
+##Tests for check.approx:
+
+check.expect("Test 1: approx floats in a list",
+             [check.approx([1.0, 2.0], [1.05, 1.95], 0.1),
+              check.approx([1.0, 2.0], [1.0, 2.5], 0.1)], [True, False])
+check.expect("Test 2: approx exact elements",
+             [check.approx((1, 2), (1, 2), 0.1),
+              check.approx(["a", "b"], ["a", "c"], 0.1)], [True, False])
+check.expect("Test 3: approx mixed elements",
+             [check.approx([1.0, "a"], [1.05, "a"], 0.1),
+              check.approx([1.0, 1], [1.05, 2], 0.1)], [True, False])
+check.expect("Test 4: approx sets",
+             [check.approx({1, 2}, {2, 1}, 0.1),
+              check.approx({1.0, 2.0}, {1.05, 2.05}, 0.1),
+              check.approx(frozenset([1]), frozenset([2]), 0.1)],
+             [True, True, False])
+check.expect("Test 5: approx dictionaries",
+             [check.approx({"a": 1.0, "b": 2.0}, {"b": 2.05, "a": 0.95}, 0.1),
+              check.approx({"a": 1.0}, {"a": 1.5}, 0.1),
+              check.approx({"a": 1.0}, {"b": 1.0}, 0.1),
+              check.approx({"a": [1.0], "b": 2}, {"a": [1.05], "b": 2}, 0.1)],
+             [True, False, False, True])
+check.expect("Test 6: approx_buffers",
+             [check.approx_buffers(array("d", [1.0, 2.0]),
+                                   array("d", [1.05, 2.0]), 0.1, False),
+              check.approx_buffers(array("d", [1.0, 2.0]),
+                                   array("d", [1.5, 2.0]), 0.1, True),
+              check.approx_buffers(array("q", [1, 2]),
+                                   array("q", [1, 2]), 0.1, False),
+              check.approx_buffers(array("d", [1.0]),
+                                   array("d", [1.0, 2.0]), 0.1, True),
+              check.approx_buffers(array("d", [1.0]), array("q", [1]), 0.1,
+                                   True),
+              check.approx_buffers([1.0], [1.0], 0.1, "same")],
+             [True, False, True, False, False, "same"])
+
+
+##Tests for check.set_input_iter and check.set_input_file:
+
+def read_two():
+  '''
+  Reads two lines of keyboard input and returns them joined, or
+  "InputError" if there is not enough input.
+
+  Effects: Reads keyboard input
+
+  read_two: None -> Str
+  '''
+  try:
+    return input() + input()
+  except check.InputError:
+    return "InputError"
+
+def endless():
+  '''
+  Produces "0", "1", "2", ... without end.
+
+  endless: None -> (iterof Str)
+  '''
+  i = 0
+  while True:
+    yield str(i)
+    i = i + 1
+
+input_dir = tempfile.mkdtemp()
+input_files = list(map(lambda name: os.path.join(input_dir, name),
+                       ["two", "one"]))
+write_text(input_files[0], "a\nb\n")
+write_text(input_files[1], "a\n")
+def input_tests():
+  check.set_input_iter(iter(["a", "b"]))
+  check.expect("i1", read_two(), "ab")
+  check.set_input_iter(["a", "b", "c"])
+  check.expect("i2", read_two(), "ab")
+  check.set_input_iter(endless())
+  check.expect("i3", read_two(), "01")
+  check.set_input_file(input_files[0])
+  check.expect("i4", read_two(), "ab")
+  check.set_input_file(input_files[1])
+  check.expect("i5", read_two(), "InputError")
+report = check_report(input_tests)
+check.expect("Test 1: set_input_iter all input used", "i1: PASSED" in report,
+             True)
+check.expect("Test 2: set_input_iter input left over",
+             ["i2: FAILED; not all input strings were used" in report,
+              "i3: FAILED; not all input strings were used" in report],
+             [True, True])
+check.expect("Test 3: set_input_file all input used",
+             "i4: PASSED" in report, True)
+check.expect("Test 4: set_input_file too little input",
+             "i5: PASSED" in report, True)
+check.expect("Test 5: set_input_iter when collecting",
+             collected_report(input_tests, 1), report)
+def deferred_input_tests():
+  check.set_input_iter(endless())
+  check.expect("d3", check.deferred(read_two), "01")
+  check.set_input_file(input_files[0])
+  check.expect("d4", check.deferred(read_two), "ab")
+report = collected_report(deferred_input_tests, 1)
+check.expect("Test 6: set_input_iter endless with a deferred call",
+             ["d3: FAILED; not all input strings were used" in report,
+              "d4: PASSED" in report],
+             [True, True])
+lines = check.file_lines(input_files[0])
+first = next(lines)
+check.expect("Test 7: set_input_file pickled partly read",
+             [[first] + list(pickle.loads(pickle.dumps(lines))), list(lines)],
+             [["a\n", "b\n"], ["b\n"]])
+
+list(map(os.remove, input_files))
+os.rmdir(input_dir)
+
+##Tests that start worker processes, in process_tests.py:
+
+here = os.path.dirname(os.path.abspath(__file__))
+process_run = subprocess.run([sys.executable, "process_tests.py"], cwd=here,
+                             capture_output=True, text=True)
+sys.stdout.write(process_run.stdout)
+check.expect("Test 1: process tests run on their own",
+             [process_run.returncode, process_run.stdout.count("PASSED")],
+             [0, 3])
@@ -0,0 +1,313 @@
+##Times every hot path of the engine and of check, and reports the
+##results as JSON, in nanoseconds per operation.
+##
+##Usage: python bench.py [--output FILE] [--compare BASELINE]
+##                       [--threshold T] [--repeat N] [--quick]
+##With --compare, each result is also compared with the same result in
+##the JSON file BASELINE, and any that are slower by more than T (by
+##default 0.10, that is, 10%) are reported as regressions, in which
+##case the exit status is 1.
+##
+##Engine events go to a NullSink while timing, so that printing does
+##not swamp the cost of the methods themselves.
+
+import argparse
+import io
+import json
+import platform
+import sys
+import time
+import check
+from role_playing_game import (Character, CharacterPool, NullSink, all_punch,
+                               set_event_sink)
+
+##Constants:
+default_repeat = 5
+default_threshold = 0.10
+party_sizes = [1, 10, 100, 1000, 10000, 100000]
+big = 10 ** 12
+
+
+def bench_init(n):
+  '''
+  Returns a function that creates n Characters.
+
+  bench_init: Nat -> (None -> Any)
+  '''
+  def run():
+    for i in range(n):
+      Character("Test", 10, 100, 50)
+  return run
+
+
+def bench_eq(n):
+  '''
+  Returns a function that compares two equal Characters n times,
+  without cached fingerprints.
+
+  bench_eq: Nat -> (None -> Any)
+  '''
+  c = Character("Test", 10, 100, 50)
+  d = Character("Test", 10, 100, 50)
+  def run():
+    for i in range(n):
+      c == d
+  return run
+
+
+def bench_repr(n):
+  '''
+  Returns a function that formats a Character n times.
+
+  bench_repr: Nat -> (None -> Any)
+  '''
+  c = Character("Test", 10, 100, 50)
+  def run():
+    for i in range(n):
+      repr(c)
+  return run
+
+
+def bench_cast_hit(n):
+  '''
+  Returns a function that casts n spells that hit but do not defeat.
+
+  bench_cast_hit: Nat -> (None -> Any)
+  '''
+  c = Character("Test", 10, 100, big)
+  e = Character("Test", 10, big, 50)
+  def run():
+    for i in range(n):
+      c.cast_spell(1, 1, e)
+  return run
+
+
+def bench_cast_miss(n):
+  '''
+  Returns a function that casts n spells without enough mp.
+
+  bench_cast_miss: Nat -> (None -> Any)
+  '''
+  c = Character("Test", 10, 100, 0)
+  e = Character("Test", 10, 100, 50)
+  def run():
+    for i in range(n):
+      c.cast_spell(1, 1, e)
+  return run
+
+
+def bench_cast_kill(n):
+  '''
+  Returns a function that casts n spells that each defeat an enemy.
+
+  bench_cast_kill: Nat -> (None -> Any)
+  '''
+  c = Character("Test", 10, 100, big)
+  enemies = list(map(lambda i: Character("Test", 10, 1, 50), range(n)))
+  def run():
+    for e in enemies:
+      c.cast_spell(1, 1, e)
+  return run
+
+
+def bench_level_up(n):
+  '''
+  Returns a function that levels up each of n Characters once.
+
+  bench_level_up: Nat -> (None -> Any)
+  '''
+  characters = list(map(lambda i: Character("Test", 10 + i % 100, 100, 50),
+                        range(n)))
+  def run():
+    for c in characters:
+      c.level_up()
+  return run
+
+
+def bench_pool_level_up(n):
+  '''
+  Returns a function that levels up every row of a CharacterPool of n
+  rows once, to compare with bench_level_up.
+
+  bench_pool_level_up: Nat -> (None -> Any)
+  '''
+  pool = CharacterPool(map(lambda i: Character("Test", 10 + i % 100, 100, 50),
+                           range(n)))
+  def run():
+    pool.level_up()
+  return run
+
+
+def bench_all_punch(size, kill):
+  '''
+  Returns a function that makes a party of size Characters punch an
+  enemy n times, defeating it each time if kill is True.
+
+  bench_all_punch: Nat Bool -> (Nat -> (None -> Any))
+  '''
+  def make(n):
+    parties = list(map(lambda i: list(map(
+      lambda j: Character("P", 1 + j % 20, 100, 50), range(size))),
+                       range(n if kill else 1)))
+    hp = 1 if kill else big
+    enemies = list(map(lambda i: Character("E", 10, hp, 50), range(n)))
+    def run():
+      for i in range(n):
+        all_punch(parties[i % len(parties)], enemies[i])
+    return run
+  return make
+
+
+def bench_run_test(screen):
+  '''
+  Returns a function that runs n check.expect tests, capturing and
+  comparing screen output if screen is True.
+
+  bench_run_test: Bool -> (Nat -> (None -> Any))
+  '''
+  def make(n):
+    def run():
+      for i in range(n):
+        if screen:
+          check.set_print_exact("Enemy defeated")
+          print("Enemy defeated")
+        check.expect("bench", i, i)
+    return run
+  return make
+
+
+def cases():
+  '''
+  Returns a list of every benchmark as a list of its name, a function
+  that makes a timed function for a number of operations, and the
+  number of operations to time.
+
+  cases: None -> (listof (list Str (Nat -> (None -> Any)) Nat))
+  '''
+  result = [["Character.__init__", bench_init, 100000],
+            ["Character.__eq__", bench_eq, 100000],
+            ["Character.__repr__", bench_repr, 100000],
+            ["cast_spell hit", bench_cast_hit, 100000],
+            ["cast_spell miss", bench_cast_miss, 100000],
+            ["cast_spell kill", bench_cast_kill, 100000],
+            ["level_up", bench_level_up, 100000],
+            ["CharacterPool.level_up", bench_pool_level_up, 100000]]
+  for size in party_sizes:
+    count = max(1, 100000 // size)
+    result.append(["all_punch hit party {0}".format(size),
+                   bench_all_punch(size, False), count])
+    result.append(["all_punch kill party {0}".format(size),
+                   bench_all_punch(size, True), count])
+  result.append(["check.run_test", bench_run_test(False), 20000])
+  result.append(["check.run_test screen", bench_run_test(True), 20000])
+  return result
+
+
+def measure(make, n, repeat):
+  '''
+  Returns the fastest time per operation, in nanoseconds, of repeat
+  runs of n operations, each set up by a fresh call to make(n).
+
+  measure: (Nat -> (None -> Any)) Nat Nat -> Float
+  '''
+  best = None
+  for i in range(repeat):
+    run = make(n)
+    start = time.perf_counter_ns()
+    run()
+    elapsed = (time.perf_counter_ns() - start) / n
+    if best is None or elapsed < best:
+      best = elapsed
+  return best
+
+
+def run_all(repeat, quick):
+  '''
+  Returns the results of every benchmark, run repeat times, with a
+  tenth as many operations if quick is True. check output produced
+  while timing is discarded.
+
+  Effects: Mutates check while running
+
+  run_all: Nat Bool -> (dictof Str Any)
+  '''
+  results = {}
+  old_sink = set_event_sink(NullSink())
+  old_stdout = check.backup_stdout
+  check.backup_stdout = io.StringIO()
+  try:
+    for name, make, n in cases():
+      if quick:
+        n = max(1, n // 10)
+      results[name] = measure(make, n, repeat)
+      check.backup_stdout.seek(0)
+      check.backup_stdout.truncate()
+  finally:
+    check.backup_stdout = old_stdout
+    sys.stdout = old_stdout
+    set_event_sink(old_sink)
+  return {"python": platform.python_version(),
+          "unit": "ns/op",
+          "results": results}
+
+
+def compare(report, baseline, threshold):
+  '''
+  Prints each result of report next to the same result of baseline,
+  marking those more than threshold slower as regressions, and
+  returns the number of regressions.
+
+  Effects: Prints to screen
+
+  compare: (dictof Str Any) (dictof Str Any) Float -> Nat
+  '''
+  regressions = 0
+  old = baseline["results"]
+  for name, new in report["results"].items():
+    if name not in old:
+      print("{0:<28}{1:>14.1f}{2:>14}".format(name, new, "new"))
+      continue
+    ratio = new / old[name] if old[name] else float("inf")
+    flag = ""
+    if ratio > 1 + threshold:
+      flag = "REGRESSION"
+      regressions = regressions + 1
+    print("{0:<28}{1:>14.1f}{2:>14.1f}{3:>8.2f}x {4}".format(
+      name, new, old[name], ratio, flag))
+  return regressions
+
+
+def main(args):
+  '''
+  Runs every benchmark and prints, saves or compares the results, as
+  described at the top of this file.
+
+  Effects: Prints to screen
+           Reads and writes files
+
+  main: (listof Str) -> Nat
+  '''
+  parser = argparse.ArgumentParser(description="Engine benchmarks")
+  parser.add_argument("--output", default=None)
+  parser.add_argument("--compare", default=None)
+  parser.add_argument("--threshold", type=float, default=default_threshold)
+  parser.add_argument("--repeat", type=int, default=default_repeat)
+  parser.add_argument("--quick", action="store_true")
+  options = parser.parse_args(args)
+  report = run_all(options.repeat, options.quick)
+  text = json.dumps(report, indent=2)
+  if options.output is not None:
+    with open(options.output, "w") as f:
+      f.write(text + "\n")
+  if options.compare is None:
+    print(text)
+    return 0
+  with open(options.compare) as f:
+    baseline = json.load(f)
+  regressions = compare(report, baseline, options.threshold)
+  print("{0} regressions".format(regressions))
+  return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+  sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,102 @@
+##Reports how long it takes to deduplicate and group a roster of
+##Characters using their cached fingerprints, and how long the
+##pairwise comparison that was needed before Characters were
+##hashable takes on a small sample of the same roster.
+##
+##Usage: python bench_dedup.py [count [distinct]]
+##count defaults to 1000000 and distinct to 50000.
+
+import random
+import sys
+import time
+from role_playing_game import Character
+
+##Constants:
+default_count = 1000000
+default_distinct = 50000
+pairwise_sample = 2000
+
+
+def make_roster(count, distinct):
+  '''
+  Returns a list of count new Characters, each a copy of one of
+  distinct different Characters chosen at random.
+
+  make_roster: Nat Nat -> (listof Character)
+  '''
+  rng = random.Random(116)
+  roster = []
+  for i in range(count):
+    j = rng.randrange(distinct)
+    c = Character("NPC{0}".format(j % 1000), 1 + j % 97,
+                  10 + j % 89, j % 83)
+    c.level = 1 + j // 8000
+    c.touch()
+    roster.append(c)
+  return roster
+
+
+def timed(function, *args):
+  '''
+  Returns the result of function(*args) and the seconds it took.
+
+  timed: (Any ... -> Any) Any ... -> (list Any Float)
+  '''
+  start = time.perf_counter()
+  result = function(*args)
+  return [result, time.perf_counter() - start]
+
+
+def pairwise_unique(roster):
+  '''
+  Returns the distinct Characters of roster, found by comparing
+  each Character with every distinct one found before it.
+
+  pairwise_unique: (listof Character) -> (listof Character)
+  '''
+  unique = []
+  for c in roster:
+    if c not in unique:
+      unique.append(c)
+  return unique
+
+
+def group(roster):
+  '''
+  Returns a dictionary mapping each distinct Character of roster
+  to the number of times it occurs in roster.
+
+  group: (listof Character) -> (dictof Character Nat)
+  '''
+  counts = {}
+  for c in roster:
+    counts[c] = counts.get(c, 0) + 1
+  return counts
+
+
+def main(args):
+  '''
+  Prints the time taken to deduplicate and group a roster.
+
+  Effects: Prints to screen
+
+  main: (listof Str) -> None
+  '''
+  count = int(args[0]) if args else default_count
+  distinct = int(args[1]) if len(args) > 1 else default_distinct
+  roster = make_roster(count, distinct)
+  unique, cold = timed(set, roster)
+  unique, warm = timed(set, roster)
+  counts, grouping = timed(group, roster)
+  sample = roster[:pairwise_sample]
+  pairwise, slow = timed(pairwise_unique, sample)
+  print("roster of {0} characters, {1} distinct".format(count, len(unique)))
+  row = "{0:<40}{1:10.3f} s"
+  print(row.format("set(), fingerprints not cached", cold))
+  print(row.format("set(), fingerprints cached", warm))
+  print(row.format("group into dict", grouping))
+  print(row.format("pairwise on {0} characters".format(len(sample)), slow))
+
+
+if __name__ == "__main__":
+  main(sys.argv[1:])
@@ -0,0 +1,56 @@
+##Reports how long a fresh Python process takes to import the game
+##engine, compared with a process that imports nothing.
+##
+##Usage: python bench_import.py [runs]
+##runs defaults to 20.
+
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+##Constants:
+default_runs = 20
+here = os.path.dirname(os.path.abspath(__file__))
+
+
+def startup_time(code):
+  '''
+  Returns the number of seconds a new Python interpreter takes to
+  start, run code, and exit. The interpreter runs in the directory
+  of this file, so that it imports the engine beside it wherever the
+  benchmark is run from.
+
+  Effects: Runs a new process
+
+  startup_time: Str -> Float
+  '''
+  start = time.perf_counter()
+  subprocess.run([sys.executable, "-c", code], check=True, cwd=here)
+  return time.perf_counter() - start
+
+
+def main(args):
+  '''
+  Prints the median startup time, over runs runs, of a process that
+  only starts Python and of one that also imports role_playing_game.
+
+  Effects: Prints to screen
+           Runs new processes
+
+  main: (listof Str) -> None
+  '''
+  runs = int(args[0]) if args else default_runs
+  baseline = statistics.median(
+    map(lambda i: startup_time("pass"), range(runs)))
+  engine = statistics.median(
+    map(lambda i: startup_time("import role_playing_game"), range(runs)))
+  row = "{0:<26}{1:8.2f} ms"
+  print(row.format("python startup", baseline * 1000))
+  print(row.format("import role_playing_game", engine * 1000))
+  print(row.format("engine import cost", (engine - baseline) * 1000))
+
+
+if __name__ == "__main__":
+  main(sys.argv[1:])
@@ -0,0 +1,105 @@
+##Reports the memory used per character for the old __dict__ layout of
+##Character, the current __slots__ layout, and a CharacterPool.
+##
+##Usage: python bench_memory.py [count ...]
+##The counts default to 10000, 100000 and 1000000.
+
+import sys
+import tracemalloc
+import role_playing_game
+
+##Constants:
+default_counts = [10000, 100000, 1000000]
+
+
+class DictCharacter:
+  '''
+  Fields: 
+     name(Str) 
+     st(Nat)
+     hp(Nat)
+     max_hp(Nat)
+     mp(Nat)
+     max_mp(Nat)
+     level(Nat)
+
+  A Character as it was laid out before __slots__: its seven fields
+  in a per-instance __dict__, and nothing cached.
+  '''
+  def __init__(self, new_name, strength, maximumHP, maximumMP):
+    '''
+    Initializes a DictCharacter object self as the old Character
+    __init__ did.
+
+    Effects: Mutates self
+
+    __init__: DictCharacter Str Nat Nat Nat -> None
+    '''
+    self.name = new_name
+    self.st = strength
+    self.hp = maximumHP
+    self.max_hp = maximumHP
+    self.mp = maximumMP
+    self.max_mp = maximumMP
+    self.level = 1
+
+
+def bytes_per_character(make, names):
+  '''
+  Returns the number of bytes allocated per character when make is
+  called once for each name in names and every result is kept alive.
+  Memory used by names themselves is not counted.
+
+  bytes_per_character: (Str -> Any) (listof Str) -> Float
+  '''
+  tracemalloc.start()
+  before = tracemalloc.get_traced_memory()[0]
+  kept = list(map(make, names))
+  after = tracemalloc.get_traced_memory()[0]
+  tracemalloc.stop()
+  # The list holding the results is not part of the layout.
+  after = after - sys.getsizeof(kept)
+  del kept
+  return (after - before) / len(names)
+
+
+def measure(count):
+  '''
+  Returns a dictionary mapping each layout name to the number of
+  bytes per character for count characters in that layout.
+
+  measure: Nat -> (dictof Str Float)
+  '''
+  names = list(map(lambda i: "NPC{0}".format(i), range(count)))
+  pool = role_playing_game.CharacterPool()
+  def add_to_pool(name):
+    pool.append(role_playing_game.Character(name, 10, 100, 50))
+  results = {}
+  results["dict"] = bytes_per_character(
+    lambda name: DictCharacter(name, 10, 100, 50), names)
+  results["slots"] = bytes_per_character(
+    lambda name: role_playing_game.Character(name, 10, 100, 50), names)
+  results["pool"] = bytes_per_character(add_to_pool, names)
+  return results
+
+
+def main(args):
+  '''
+  Prints a table of bytes per character for each count in args,
+  or for default_counts if args is empty.
+
+  Effects: Prints to screen
+
+  main: (listof Str) -> None
+  '''
+  counts = list(map(int, args)) or default_counts
+  print("{0:>10} {1:>10} {2:>10} {3:>10}".format(
+    "count", "dict", "slots", "pool"))
+  for count in counts:
+    results = measure(count)
+    print("{0:>10} {1:>10.1f} {2:>10.1f} {3:>10.1f}".format(
+      count, results["dict"], results["slots"], results["pool"]))
+
+
+if __name__ == "__main__":
+  main(sys.argv[1:])
@@ -7,14 +7,22 @@
     * check.expect, for testing all other functions
     * check.set_screen, for testing screen output (print statements)
     * check.set_input, for testing keyboard input (raw_input)
+    * check.set_input_file and check.set_input_iter, for
+      keyboard input read a line at a time from a file or
+      an iterator
     * check.set_file, for testing file output
+    * check.collect and check.run_collected, for running
+      many tests across several processes
 
     For details on using these functions, please read
     the Python Style guide from the CS 116 website,
     www.student.cs.uwaterloo.ca/~cs116/styleGuide
 """
 
-import sys, os, builtins
+import sys, os, builtins, pickle, multiprocessing, fnmatch, time
+from collections import deque
+from itertools import chain, islice, repeat, zip_longest
+from operator import le, sub
 backup_stdin = sys.stdin
 backup_stdout = sys.stdout
 old_input = builtins.input
@@ -34,42 +42,166 @@ class InputError(Exception):
         return self.val
     
 
+class dir_watcher:
+    """
+    Lists the entries of one directory (the current directory
+    if path is None) for set_file, as a dictionary from the
+    name of each entry matching the glob pattern (every entry
+    if pattern is None) to its inode, and also its mtime and
+    size if it is not a directory. A listing is kept with the
+    directory's inode and mtime and reused until the directory
+    changes, since adding, removing or replacing an entry
+    changes the directory's mtime. A directory changed within
+    racy_window seconds of a listing is listed again, in case
+    a later change landed on the same mtime. A file rewritten
+    in place is only seen when the directory is listed again,
+    which is usually the case since the test's own result file
+    is written to it as well.
+    """
+    racy_window = 0.05
+    def __init__(self, path = None, pattern = None):
+        self.path = path
+        self.pattern = pattern
+        self.key = None
+        self.entries = None
+        self.listed = 0
+    def snapshot(self):
+        now = time.time_ns()
+        path = os.path.abspath(self.path or os.getcwd())
+        info = os.stat(path)
+        key = (path, info.st_ino, info.st_mtime_ns)
+        if key != self.key or info.st_mtime_ns >= self.listed - self.racy_window * 1e9:
+            entries = {}
+            with os.scandir(path) as it:
+                for entry in it:
+                    if self.pattern is None or fnmatch.fnmatch(entry.name, self.pattern):
+                        try:
+                            if entry.is_dir(follow_symlinks = False):
+                                entries[entry.name] = (entry.inode(),)
+                            else:
+                                info = entry.stat(follow_symlinks = False)
+                                entries[entry.name] = (info.st_ino, info.st_mtime_ns, info.st_size)
+                        except FileNotFoundError:
+                            pass
+            self.key = key
+            self.entries = entries
+            self.listed = now
+        return self.entries
+    def changes(self, before, new_files, after = None):
+        """
+        Returns two sorted lists of names, except for the files
+        named in new_files: the entries added, removed or
+        replaced between the listings before and after (a new
+        listing if after is None), and the files rewritten in
+        place between them.
+        """
+        if after is None:
+            after = self.snapshot()
+        path = os.path.abspath(self.path or os.getcwd())
+        ignored = set(map(lambda name: os.path.relpath(os.path.abspath(name), path), new_files))
+        changed = set(before) ^ set(after)
+        modified = set()
+        for name in after:
+            if name in before and before[name] != after[name]:
+                if before[name][0] == after[name][0]:
+                    modified.add(name)
+                else:
+                    changed.add(name)
+        return sorted(changed - ignored), sorted(modified - ignored)
+
+class input_feed:
+    """
+    The lines of keyboard input left for a test: lines that
+    are ready, in a deque, followed by any lines not yet read
+    from source, an iterator of strings. A line is only read
+    from source when it is needed. An input_feed is true if
+    any lines are left, so run_test can check that all of the
+    input was used.
+    """
+    def __init__(self, lines = (), source = None):
+        self.lines = deque(lines)
+        self.source = source
+    def fill(self):
+        if self.lines:
+            return True
+        if self.source is not None:
+            for line in self.source:
+                if type(line) != str:
+                    raise TypeError("all inputs must be strings")
+                if not line.endswith("\n"):
+                    line += "\n"
+                self.lines.append(line)
+                return True
+            self.source = None
+        return False
+    def __bool__(self):
+        return self.fill()
+    def __iter__(self):
+        while self.fill():
+            yield self.lines.popleft()
+    def pop(self):
+        if self.fill():
+            return self.lines.popleft()
+        raise InputError()
+
 class redirect_input:
     """
     Keyboard input is redirected from this class
     whenever set_input is called.
     """
     def __init__(self, inp):
+        if not isinstance(inp, input_feed):
+            inp = input_feed(inp)
         self.lst = inp
     def readline(self):
-        if self.lst:
-            return self.lst.pop(0)
-        else:
-            raise InputError()
+        return self.lst.pop()
 
 class redirect_output:
     """
     Screen output is redirected to this class
-    whenever set_screen is called.
+    whenever set_screen is called. Writes are kept
+    in a list and joined once when the output is read.
+    If limit is not None, at most limit characters are
+    kept and truncated counts the characters dropped.
     """
-    def __init__(self):
-        self.screen = ""
+    def __init__(self, limit = None):
+        self.chunks = []
+        self.size = 0
+        self.limit = limit
+        self.truncated = 0
     def __str__(self):
-        return self.screen
+        if len(self.chunks) > 1:
+            self.chunks = ["".join(self.chunks)]
+        return self.chunks[0] if self.chunks else ""
     def __nonzero__(self):
-        return bool(self.screen)
+        return self.size > 0
     def write(self, string):
-        self.screen += string
+        if self.limit is not None and self.size + len(string) > self.limit:
+            kept = max(self.limit - self.size, 0)
+            self.truncated += len(string) - kept
+            string = string[:kept]
+        if string:
+            self.chunks.append(string)
+            self.size += len(string)
     def reset(self):
-        self.screen = ""
+        self.chunks = []
+        self.size = 0
+        self.truncated = 0
 
 expected_screen = ""
+screen_limit = None
+file_mismatch_limit = None
 actual_screen = redirect_output()
 test_output = redirect_output()
 input_list = []
 file_list = []
 dir_list = []
+dir_after = None
 exact_screen = False
+collected = None
+watcher = dir_watcher()
+exact_types = (int, str, bool)
+float_formats = ("f", "d")
 
 
 def set_screen(string):
@@ -97,6 +229,38 @@ def set_print_exact(*strlst):
     
     
 
+def set_screen_limit(limit):
+    """
+    Consumes the maximum number of characters of screen
+    output to keep for each later call to check.expect or
+    check.within, or None to keep all of it. Output past the
+    limit is dropped and reported as truncated.
+    """
+    global screen_limit
+    screen_limit = limit
+    actual_screen.limit = limit
+
+def set_file_mismatch_limit(limit):
+    """
+    Consumes the maximum number of mismatched lines to report
+    for each file compared by later calls to check.expect or
+    check.within, or None to report all of them. Comparing
+    stops as soon as that many lines have not matched.
+    """
+    global file_mismatch_limit
+    file_mismatch_limit = limit
+
+def set_file_watch(path = None, pattern = None):
+    """
+    Limits the search for additional files created during
+    later tests that use check.set_file or check.set_file_exact
+    to the directory path (the current directory if path is
+    None), and to names matching the glob pattern (all names
+    if pattern is None).
+    """
+    global watcher
+    watcher = dir_watcher(path, pattern)
+
 def set_input(*inputs):
     """
     Consumes a variable amount of strings representing keyboard input for
@@ -109,12 +273,69 @@ def set_input(*inputs):
     for i in inputs:
         if type(i) != str:
             raise TypeError("all parameters must be strings")
-    input_list = list(map(lambda s: s+"\n", inputs))
+    input_list = input_feed(map(lambda s: s+"\n", inputs))
     
     
     sys.stdin = redirect_input(input_list)
     sys.stdout = actual_screen
 
+def set_input_iter(inputs):
+    """
+    Consumes an iterator of strings representing keyboard
+    input for the next call to check.expect or check.within,
+    one string per line. Strings are taken from inputs only
+    as they are read, so inputs can be very long.
+    """
+    global input_list
+    input_list = input_feed(source = iter(inputs))
+    sys.stdin = redirect_input(input_list)
+    sys.stdout = actual_screen
+
+class file_lines:
+    """
+    Produces the lines of the file called filename, one at
+    a time, opening it when the first line is needed and
+    closing it once they have all been produced. A file_lines
+    is pickled as its file's name and how far it has been
+    read, so a deferred test sent to another process reads
+    its input file there, as it needs it.
+    Do not use file_lines in your code for CS 116.
+    """
+    def __init__(self, filename):
+        self.filename = os.path.abspath(filename)
+        self.file = None
+        self.offset = 0
+        self.done = False
+    def __iter__(self):
+        return self
+    def __next__(self):
+        if self.done:
+            raise StopIteration
+        if self.file is None:
+            self.file = open(self.filename, 'r')
+            self.file.seek(self.offset)
+        line = self.file.readline()
+        if not line:
+            self.file.close()
+            self.file = None
+            self.done = True
+            raise StopIteration
+        return line
+    def __getstate__(self):
+        offset = self.file.tell() if self.file is not None else self.offset
+        return (self.filename, offset, self.done)
+    def __setstate__(self, state):
+        self.filename, self.offset, self.done = state
+        self.file = None
+
+def set_input_file(filename):
+    """
+    Consumes the name of a file whose lines are the keyboard
+    input for the next call to check.expect or check.within.
+    Lines are read from the file only as they are needed.
+    """
+    set_input_iter(file_lines(filename))
+
 def set_file(resulting_file, expected_file):
     """
     Consumes two strings: resulting_file (the name
@@ -126,7 +347,7 @@ def set_file(resulting_file, expected_file):
     to check.expect or check.within.
     """
     global file_list, dir_list
-    dir_list = os.listdir(os.getcwd())
+    dir_list = watcher.snapshot()
     file_list.append((resulting_file, expected_file, False))
 
 def set_file_exact(resulting_file, expected_file):
@@ -140,7 +361,7 @@ def set_file_exact(resulting_file, expected_file):
     to check.expect or check.within.
     """
     global file_list, dir_list
-    dir_list = os.listdir(os.getcwd())
+    dir_list = watcher.snapshot()
     file_list.append((resulting_file, expected_file, True))
 
 def expect(label, function_call, expected_value):
@@ -150,7 +371,10 @@ def expect(label, function_call, expected_value):
     input given to set_input, and compare files given
     to set_files.
     """
-    run_test(label, function_call, expected_value, None)
+    if collected is not None:
+        collect_case(label, function_call, expected_value, None)
+    else:
+        run_test(label, function_call, expected_value, None)
 
 def within(label, function_call, expected_value, acceptable_tolerance):
     """
@@ -159,7 +383,162 @@ def within(label, function_call, expected_value, acceptable_tolerance):
     keyboard input given to set_input, and compare files
     given to set_files.
     """
-    run_test(label, function_call, expected_value, acceptable_tolerance)
+    if collected is not None:
+        collect_case(label, function_call, expected_value, acceptable_tolerance)
+    else:
+        run_test(label, function_call, expected_value, acceptable_tolerance)
+
+class deferred:
+    """
+    A function call that is not made until its test is run.
+    Passing deferred(f, a, b) to check.expect or check.within
+    in place of f(a, b) lets check.run_collected make the call
+    in a worker process, with that worker's own screen and
+    keyboard redirection.
+    """
+    def __init__(self, function, *args):
+        self.function = function
+        self.args = args
+    def __call__(self):
+        return self.function(*self.args)
+
+def collect():
+    """
+    Starts collecting tests: later calls to check.expect and
+    check.within record their test, along with the screen,
+    input and file settings made for it, instead of running it.
+    The tests are run by check.run_collected.
+    """
+    global collected
+    collected = []
+
+def collect_case(label, result, expected, tolerance):
+    """
+    Records a test given to check.within or check.expect
+    while collecting, and resets the settings for the next one.
+    The input for a deferred call is kept as it is, and only
+    read as the call needs it: from set_input_file, the file
+    is read by the process that runs the test, and a test
+    whose input comes from an iterator that cannot be pickled,
+    such as a generator, makes check.run_collected run every
+    test in this process. If the function being tested has
+    already been called, only one line of any input it left is
+    read, which is enough to report it, and the files it left
+    are listed now too, so that files created by later tests
+    are not blamed on it. The screen and file mismatch limits and
+    the directory watched are recorded with the test, since a
+    process started to run it does not share them.
+    Do not use collect_case in your code.
+    """
+    global expected_screen, input_list, file_list, dir_list, exact_screen
+    after = None
+    if isinstance(result, deferred):
+        output = ("", 0)
+        inputs = input_list
+    else:
+        output = (str(actual_screen), actual_screen.truncated)
+        inputs = list(islice(input_list, 1))
+        if file_list:
+            after = watcher.snapshot()
+    collected.append((label, result, expected, tolerance,
+                      expected_screen, exact_screen, output,
+                      inputs, file_list, dir_list, after,
+                      (screen_limit, file_mismatch_limit,
+                       watcher.path, watcher.pattern)))
+    input_list, file_list, dir_list = [], [], []
+    expected_screen = ""
+    exact_screen = False
+    actual_screen.reset()
+    sys.stdin = backup_stdin
+    sys.stdout = backup_stdout
+    builtins.input = old_input
+
+def run_case(case):
+    """
+    Runs a test recorded by collect_case in this process, with
+    the settings recorded with it, and returns what run_test
+    printed for it. The directory is listed again just before
+    a deferred call, so that only the files it creates are
+    reported, and not those of the tests collected before it.
+    Do not use run_case in your code.
+    """
+    global expected_screen, input_list, file_list, dir_list, dir_after, exact_screen, backup_stdout
+    global screen_limit, file_mismatch_limit, watcher
+    (label, result, expected, tolerance, expected_screen, exact_screen,
+     output, input_list, file_list, dir_list, dir_after, settings) = case
+    if not isinstance(input_list, input_feed):
+        input_list = input_feed(input_list)
+    report = redirect_output()
+    saved_stdout = backup_stdout
+    saved_settings = (screen_limit, file_mismatch_limit, watcher)
+    backup_stdout = report
+    try:
+        screen_limit, file_mismatch_limit = settings[:2]
+        if (watcher.path, watcher.pattern) != settings[2:]:
+            watcher = dir_watcher(*settings[2:])
+        actual_screen.reset()
+        actual_screen.limit = screen_limit
+        if isinstance(result, deferred):
+            if file_list:
+                dir_list = watcher.snapshot()
+            if expected_screen or exact_screen or input_list:
+                sys.stdin = redirect_input(input_list)
+                sys.stdout = actual_screen
+                builtins.input = blank_input
+            else:
+                sys.stdout = report
+            result = result()
+        else:
+            actual_screen.write(output[0])
+            actual_screen.truncated = output[1]
+        run_test(label, result, expected, tolerance)
+    finally:
+        backup_stdout = saved_stdout
+        screen_limit, file_mismatch_limit, watcher = saved_settings
+        actual_screen.limit = screen_limit
+        dir_after = None
+        sys.stdin = backup_stdin
+        sys.stdout = backup_stdout
+        builtins.input = old_input
+    return str(report)
+
+def run_pickled(case):
+    """
+    Runs a test recorded by collect_case and pickled by
+    run_collected, and returns what run_test printed for it.
+    Do not use run_pickled in your code.
+    """
+    return run_case(pickle.loads(case))
+
+def run_collected(processes = None):
+    """
+    Runs the tests recorded since check.collect was called,
+    using a pool of processes (one per CPU if processes is
+    None), and prints their results in the order the tests
+    were given. Stops collecting tests. If processes is 1, or
+    a test cannot be sent to another process, all of the tests
+    are run in this process instead.
+    """
+    global collected
+    cases = collected
+    collected = None
+    pickled = None
+    if processes != 1 and len(cases) > 1:
+        # each test is pickled once, here, rather than once to
+        # check that it can be and again to send it
+        try:
+            pickled = list(map(pickle.dumps, cases))
+        except (pickle.PicklingError, TypeError, AttributeError):
+            pickled = None
+    if pickled is None:
+        reports = list(map(run_case, cases))
+    else:
+        workers = processes or os.cpu_count() or 1
+        chunk = max(1, len(cases) // (4 * workers))
+        with multiprocessing.Pool(workers) as pool:
+            reports = pool.map(run_pickled, pickled, chunk)
+    for report in reports:
+        sys.stdout.write(report)
 
 def run_test(label, result, expected, tolerance):
     """
@@ -187,18 +566,22 @@ def run_test(label, result, expected, tolerance):
         new_files = []
         for tup in file_list:
             new_label = "{0} {1}".format(label, tup[0:2])
-            compare_files(new_label, new_files, tup[0], tup[1], tup[2])
-        extra_files = list(set(os.listdir(os.getcwd())) ^ set(dir_list + new_files) )
+            compare_files(new_label, new_files, tup[0], tup[1], tup[2], file_mismatch_limit)
+        extra_files, modified_files = watcher.changes(dir_list, new_files, dir_after)
         if extra_files:
             print ("{0}: The following additional files were created: {1}".format(label, ", ".join(extra_files)))
+        if modified_files:
+            print ("{0}: The following existing files were modified: {1}".format(label, ", ".join(modified_files)))
     
+    if actual_screen.truncated:
+        print("{0}: screen output truncated; {1} characters were not kept\n".format(label, actual_screen.truncated))
     if exact_screen:
         actual_screen = str(actual_screen)[:-1]
         if expected_screen != actual_screen:	    
             print("{0} - print output: FAILED; expected\n{1}\nsaw\n{2}\n".format(label, expected_screen, actual_screen))
         else:
             print("{0} - print output: PASSED\n".format(label))
-        actual_screen = redirect_output()
+        actual_screen = redirect_output(screen_limit)
     elif expected_screen:
         print ("{0} (expected screen output):".format(label))
         print (expected_screen)
@@ -235,11 +618,29 @@ def approx(result, expected, tolerance):
         return abs(result.real - expected.real) <= tolerance and \
                abs(result.imag - expected.imag) <= tolerance
     elif tp in (list, tuple): # sequences that can contain floats
-        return len(result) == len(expected) and \
-               all(map(approx, result, expected, [tolerance]*len(result)))
+        if len(result) != len(expected):
+            return False
+        kind = same_type(result, expected)
+        if kind == float:
+            return within_all(result, expected, tolerance)
+        elif kind in exact_types:
+            return result == expected
+        return all(map(approx, result, expected, [tolerance]*len(result)))
     elif tp in (dict, type(redirect_output()), set, frozenset):
     # unordered containers that can contain floats
     # for whatever reason, 'instance' is not a type, so type(redirect_output) is used instead
+        if tp in (set, frozenset) and same_type(result, expected) in exact_types:
+            # sorting would pair up equal elements, which are equal
+            # without any tolerance
+            return result == expected
+        if tp == dict and same_type(result, expected) in exact_types:
+            # sorting would pair up equal keys, so values can be
+            # compared by key instead, in the same order
+            if result.keys() != expected.keys():
+                return False
+            if same_type(result.values(), expected.values()) == float:
+                return within_all(result.values(), map(expected.__getitem__, result), tolerance)
+            return all(map(lambda key: approx(result[key], expected[key], tolerance), sorted(result)))
         if tp == dict:
             result = result.items()
             expected = expected.items()
@@ -252,62 +653,137 @@ def approx(result, expected, tolerance):
         # if tp in (set, frozenset) then no action required
         return approx(sorted(result), sorted(expected), tolerance)
     else: # anything that hits else cannot contain floats
-        return result == expected
+        same = result == expected
+        if type(same) == bool:
+            return same
+        # == on arrays (as in NumPy) compares element by element
+        return approx_buffers(result, expected, tolerance, same)
 
-def compare_files(label, new_files, fname1, fname2, exact):
+def same_type(result, expected):
+    """
+    Returns the type of every element of result and expected,
+    or None if they are empty or their elements do not all
+    have the same type.
+    Do not use same_type in your code for CS 116.
+    """
+    types = set(map(type, result))
+    types.update(map(type, expected))
+    if len(types) == 1:
+        return types.pop()
+    return None
+
+def within_all(result, expected, tolerance):
+    """
+    Returns True if each float in result is within tolerance
+    of the float in the same place in expected.
+    Do not use within_all in your code for CS 116.
+    """
+    return all(map(le, map(abs, map(sub, result, expected)), repeat(tolerance)))
+
+def approx_buffers(result, expected, tolerance, same):
+    """
+    Compares two arrays that support the buffer protocol,
+    such as NumPy arrays, all at once: floats must be within
+    tolerance and anything else must be equal. Returns same,
+    the result of ==, if they cannot be compared that way.
+    Do not use approx_buffers in your code for CS 116.
+    """
+    try:
+        view1 = memoryview(result)
+        view2 = memoryview(expected)
+        if view1.shape != view2.shape or view1.format != view2.format:
+            return False
+        flat1 = memoryview(view1.tobytes()).cast(view1.format)
+        flat2 = memoryview(view2.tobytes()).cast(view2.format)
+    except (TypeError, ValueError):
+        return same
+    if view1.format in float_formats:
+        return within_all(flat1, flat2, tolerance)
+    return flat1 == flat2
+
+def stripped_lines(f):
+    """
+    Produces the lines of the open file f, stripped of
+    surrounding whitespace, leaving out the blank lines at
+    the end of f. Blank lines are only counted until a line
+    that is not blank follows them, so f is never held in
+    memory.
+    Do not use stripped_lines in your code for CS 116.
+    """
+    blanks = 0
+    for line in f:
+        line = line.strip()
+        if line == "":
+            blanks += 1
+        else:
+            for i in range(blanks):
+                yield ""
+            blanks = 0
+            yield line
+
+def compare_files(label, new_files, fname1, fname2, exact, max_mismatches = None):
     """
     Performs file comparisons for check.within and check.expect.
+    The files are read together one line at a time, and
+    reading stops after max_mismatches mismatched lines if
+    max_mismatches is not None.
     Do not use compare_files in your code for CS 116.
     """
     try:
-        f = open(fname1, 'r')
-        lines1 = list(map(lambda x: x.strip(), f.readlines()))
-        f.close()
+        f1 = open(fname1, 'r')
         new_files.append(fname1)
     except IOError:
         print ("{0}: File {1} does not exist\n".format(label, fname1))
         return None
     try:
-        f = open(fname2, 'r')
-        lines2 = list(map(lambda x: x.strip(), f.readlines()))
-        f.close()
+        f2 = open(fname2, 'r')
         new_files.append(fname2)
     except IOError:
+        f1.close()
         print ("{0}: File {1} does not exist\n".format(label, fname2))
         return None
     
-    if lines1 == [] and lines2 == []:
-        return None
-    elif lines1 == []:
-        print ("{0}: {1} is empty but {2} is not.".format(label, fname1, fname2))
-        print ("{0} (line 1): {1}\n".format(fname2, lines2[0]))
-        return None
-    elif lines2 == []:
-        print ("{0}: {1} is empty but {2} is not.".format(label, fname2, fname1))
-        print ("{0} (line 1): {1}\n".format(fname1, lines1[0]))
-        return None
-    
-    while lines1[-1].isspace() or lines1[-1] == "":
-        lines1.pop()
-    while lines2[-1].isspace() or lines2[-1] == "":
-        lines2.pop()
+    with f1, f2:
+        first1 = f1.readline()
+        first2 = f2.readline()
+        if first1 == "" and first2 == "":
+            return None
+        elif first1 == "":
+            print ("{0}: {1} is empty but {2} is not.".format(label, fname1, fname2))
+            print ("{0} (line 1): {1}\n".format(fname2, first2.strip()))
+            return None
+        elif first2 == "":
+            print ("{0}: {1} is empty but {2} is not.".format(label, fname2, fname1))
+            print ("{0} (line 1): {1}\n".format(fname1, first1.strip()))
+            return None
+        
+        lines1 = stripped_lines(chain([first1], f1))
+        lines2 = stripped_lines(chain([first2], f2))
+        same_length = True
+        stopped = False
+        bad_lines = []
+        first_pair = None
+        line_number = 0
+        for line1, line2 in zip_longest(lines1, lines2):
+            line_number += 1
+            if line1 is None or line2 is None:
+                same_length = False
+                break
+            if exact:
+                same = line1.rstrip() == line2.rstrip()
+            else:
+                same = "".join(line1.split()) == "".join(line2.split())
+            if not same:
+                bad_lines.append(line_number)
+                if first_pair is None:
+                    first_pair = (line1, line2)
+                if max_mismatches is not None and len(bad_lines) >= max_mismatches:
+                    stopped = True
+                    break
     
-    if len(lines1) != len(lines2):
+    if not same_length:
         print ("{0}: {1} and {2} do not contain the same number of lines.".format(label, fname1, fname2))
     
-    n = min(len(lines1), len(lines2))
-    bad_lines = []
-    
-    for i in range(n):
-        if exact:
-            line1 = lines1[i].rstrip()
-            line2 = lines2[i].rstrip()
-        else:
-            line1 = "".join(lines1[i].split())
-            line2 = "".join(lines2[i].split())
-        if line1 != line2:
-            bad_lines.append(i+1)
-    
     if bad_lines:
         first_line = bad_lines[0]
         bad_lines = ", ".join(map(lambda x: str(x), bad_lines))
@@ -319,9 +795,12 @@ def compare_files(label, new_files, fname1, fname2, exact):
         else:
             fname2 += extra_spaces
         
-        print ("{0} (line {1}): {2}".format(fname1, first_line, lines1[first_line-1]))
-        print ("{0} (line {1}): {2}".format(fname2, first_line, lines2[first_line-1]))
+        print ("{0} (line {1}): {2}".format(fname1, first_line, first_pair[0]))
+        print ("{0} (line {1}): {2}".format(fname2, first_line, first_pair[1]))
+    
+    if stopped:
+        print ("{0}: stopped comparing after {1} mismatched lines".format(label, max_mismatches))
     
-    if len(lines1) != len(lines2) or bad_lines:
+    if not same_length or bad_lines:
         print ("")
 
@@ -0,0 +1,71 @@
+##Tests of simulate and check.run_collected that start worker processes.
+##"Role Playing Game.py" runs this file as a script of its own: where
+##workers are started by importing the main script afresh, they import
+##this file, which runs no tests when imported, rather than the whole
+##test suite.
+
+import check
+import io
+import os
+import sys
+import tempfile
+from simulator import simulate
+
+
+def collected_report(tests, processes):
+  '''
+  Returns what check prints when tests() is run while collecting and
+  the collected tests are then run with processes processes.
+
+  Effects: Mutates check while running
+
+  collected_report: (None -> Any) (anyof Nat None) -> Str
+  '''
+  old_stdout = check.backup_stdout
+  check.backup_stdout = io.StringIO()
+  try:
+    check.collect()
+    tests()
+    check.run_collected(processes)
+    return check.backup_stdout.getvalue()
+  finally:
+    check.backup_stdout = old_stdout
+    sys.stdout = old_stdout
+
+def plain_tests():
+  check.expect("c1", 1 + 1, 2)
+  check.expect("c2", check.deferred(max, 3, 4), 4)
+  check.within("c3", check.deferred(abs, -1.5), 1.0, 0.01)
+  check.set_print_exact("Enemy defeated")
+  check.expect("c4", check.deferred(print, "Enemy defeated"), None)
+
+def read_two():
+  '''
+  Reads two lines of keyboard input and returns them joined.
+
+  Effects: Reads keyboard input
+
+  read_two: None -> Str
+  '''
+  return input() + input()
+
+
+if __name__ == "__main__":
+  check.expect("Test 1: simulate independent of processes and shards",
+               simulate(116, 300, 2, shard_size=70),
+               simulate(116, 300, 1, shard_size=50))
+  check.expect("Test 2: collect runs in processes",
+               collected_report(plain_tests, 2),
+               collected_report(plain_tests, 1))
+  with tempfile.TemporaryDirectory() as input_dir:
+    input_file = os.path.join(input_dir, "two")
+    with open(input_file, "w") as f:
+      f.write("a\nb\n")
+    def input_tests():
+      check.set_input_file(input_file)
+      check.expect("i1", check.deferred(read_two), "ab")
+      check.set_input_file(input_file)
+      check.expect("i2", check.deferred(read_two), "ab")
+    report = collected_report(input_tests, 2)
+    check.expect("Test 3: collect reads input files in processes",
+                 [report.count("PASSED"), report.count("FAILED")], [2, 0])
@@ -0,0 +1,254 @@
+##Opt-in profiling of Character.cast_spell, Character.level_up and
+##all_punch.
+##
+##enable() replaces each of them with a wrapper that counts its calls,
+##counts which branch each call takes, and adds its latency to a
+##histogram. disable() puts the original functions back, so while
+##profiling is off the engine runs exactly the code it always does,
+##with no flag to check on each call.
+##
+##Branches are worked out from the state of the characters just before
+##the call, as the engine itself decides them:
+##   cast_spell  "not_enough_mp", "already_defeated", "kill" or "hit";
+##               a call can be both "not_enough_mp" and
+##               "already_defeated"
+##   all_punch   "kill" or "hit", and also "already_defeated" if the
+##               enemy had no hp left
+##   level_up    "levels" counts the levels gained, not the calls
+##
+##Latencies are kept in log2 buckets: bucket b counts calls that took
+##fewer than 2 ** b nanoseconds but at least 2 ** (b - 1).
+##
+##The results can be read as a dictionary with snapshot() or as
+##Prometheus text exposition format with prometheus_text().
+
+import sys
+import time
+from collections import Counter
+from functools import wraps
+import role_playing_game
+from role_playing_game import Character
+
+##Constants:
+methods = ("cast_spell", "level_up", "all_punch")
+metric_prefix = "rpg"
+
+##Profiling results, by method name.
+calls = Counter()
+branches = dict(map(lambda method: (method, Counter()), methods))
+histograms = dict(map(lambda method: (method, Counter()), methods))
+latency_sums = Counter()
+
+##The (owner, attribute, original) of each function replaced by
+##enable(), or None while profiling is off.
+_patched = None
+
+
+def reset():
+  '''
+  Discards every profiling result recorded so far.
+
+  Effects: Mutates calls, branches, histograms and latency_sums
+
+  reset: None -> None
+  '''
+  calls.clear()
+  latency_sums.clear()
+  for method in methods:
+    branches[method].clear()
+    histograms[method].clear()
+
+
+def record(method, start):
+  '''
+  Records a call of method that started at perf_counter_ns() time
+  start and has just finished.
+
+  Effects: Mutates calls, histograms and latency_sums
+
+  record: Str Nat -> None
+  '''
+  elapsed = time.perf_counter_ns() - start
+  calls[method] += 1
+  latency_sums[method] += elapsed
+  histograms[method][elapsed.bit_length()] += 1
+
+
+def profiled_cast_spell(original):
+  '''
+  Returns a profiling wrapper for the Character.cast_spell original.
+
+  profiled_cast_spell: Function -> Function
+  '''
+  counts = branches["cast_spell"]
+  @wraps(original)
+  def cast_spell(self, cost, damage, enemy):
+    hp = enemy.hp
+    if self.mp < cost:
+      counts["not_enough_mp"] += 1
+      if hp <= 0:
+        counts["already_defeated"] += 1
+    elif hp <= 0:
+      counts["already_defeated"] += 1
+    elif hp - damage <= 0:
+      counts["kill"] += 1
+    else:
+      counts["hit"] += 1
+    start = time.perf_counter_ns()
+    original(self, cost, damage, enemy)
+    record("cast_spell", start)
+  return cast_spell
+
+
+def profiled_level_up(original):
+  '''
+  Returns a profiling wrapper for the Character.level_up original.
+
+  profiled_level_up: Function -> Function
+  '''
+  counts = branches["level_up"]
+  @wraps(original)
+  def level_up(self, n=1):
+    counts["levels"] += n
+    start = time.perf_counter_ns()
+    original(self, n)
+    record("level_up", start)
+  return level_up
+
+
+def profiled_all_punch(original):
+  '''
+  Returns a profiling wrapper for the all_punch original.
+
+  profiled_all_punch: Function -> Function
+  '''
+  counts = branches["all_punch"]
+  @wraps(original)
+  def all_punch(players, enemy):
+    if enemy.hp <= 0:
+      counts["already_defeated"] += 1
+    start = time.perf_counter_ns()
+    original(players, enemy)
+    record("all_punch", start)
+    if enemy.hp <= 0:
+      counts["kill"] += 1
+    else:
+      counts["hit"] += 1
+  return all_punch
+
+
+def enable():
+  '''
+  Starts profiling, if it is not already on. all_punch is replaced
+  in role_playing_game and in every module that has imported it by
+  name, so calls through those names are profiled too.
+
+  Effects: Mutates Character
+           Mutates the modules that refer to all_punch
+
+  enable: None -> None
+  '''
+  global _patched
+  if _patched is not None:
+    return
+  patched = []
+  for name, wrap in (("cast_spell", profiled_cast_spell),
+                     ("level_up", profiled_level_up)):
+    original = Character.__dict__[name]
+    patched.append([Character, name, original])
+    setattr(Character, name, wrap(original))
+  original = role_playing_game.all_punch
+  wrapper = profiled_all_punch(original)
+  for module in list(sys.modules.values()):
+    if getattr(module, "all_punch", None) is original:
+      patched.append([module, "all_punch", original])
+      module.all_punch = wrapper
+  _patched = patched
+
+
+def disable():
+  '''
+  Stops profiling, if it is on, putting back every function enable()
+  replaced. Results recorded so far are kept.
+
+  Effects: Mutates Character
+           Mutates the modules that refer to all_punch
+
+  disable: None -> None
+  '''
+  global _patched
+  if _patched is None:
+    return
+  for owner, name, original in _patched:
+    setattr(owner, name, original)
+  _patched = None
+
+
+def enabled():
+  '''
+  Returns True if profiling is on and False otherwise.
+
+  enabled: None -> Bool
+  '''
+  return _patched is not None
+
+
+def snapshot():
+  '''
+  Returns a copy of the profiling results. For each method it holds
+  "calls", "branches" (a dictionary of branch counts), "latency_ns"
+  (the total latency) and "histogram" (a dictionary mapping the upper
+  bound in nanoseconds of each non-empty bucket to its count).
+
+  snapshot: None -> (dictof Str (dictof Str Any))
+
+  Examples:
+     reset()
+     snapshot()["level_up"] => {"calls": 0, "branches": {},
+                                "latency_ns": 0, "histogram": {}}
+  '''
+  result = {}
+  for method in methods:
+    result[method] = {
+      "calls": calls[method],
+      "branches": dict(branches[method]),
+      "latency_ns": latency_sums[method],
+      "histogram": dict(map(lambda bucket: (2 ** bucket,
+                                            histograms[method][bucket]),
+                            sorted(histograms[method])))}
+  return result
+
+
+def prometheus_text():
+  '''
+  Returns the profiling results in Prometheus text exposition format:
+  a counter of calls and a counter of branches, labelled by method,
+  and a histogram of latencies in seconds.
+
+  prometheus_text: None -> Str
+  '''
+  lines = ["# TYPE {0}_calls_total counter".format(metric_prefix)]
+  for method in methods:
+    lines.append('{0}_calls_total{{method="{1}"}} {2}'.format(
+      metric_prefix, method, calls[method]))
+  lines.append("# TYPE {0}_branch_total counter".format(metric_prefix))
+  for method in methods:
+    for branch, count in sorted(branches[method].items()):
+      lines.append('{0}_branch_total{{method="{1}",branch="{2}"}} {3}'.format(
+        metric_prefix, method, branch, count))
+  lines.append("# TYPE {0}_latency_seconds histogram".format(metric_prefix))
+  for method in methods:
+    total = 0
+    for bucket in sorted(histograms[method]):
+      total = total + histograms[method][bucket]
+      lines.append('{0}_latency_seconds_bucket{{method="{1}",le="{2:g}"}} '
+                   '{3}'.format(metric_prefix, method, 2 ** bucket / 1e9,
+                                total))
+    lines.append('{0}_latency_seconds_bucket{{method="{1}",le="+Inf"}} '
+                 '{2}'.format(metric_prefix, method, calls[method]))
+    lines.append('{0}_latency_seconds_sum{{method="{1}"}} {2:g}'.format(
+      metric_prefix, method, latency_sums[method] / 1e9))
+    lines.append('{0}_latency_seconds_count{{method="{1}"}} {2}'.format(
+      metric_prefix, method, calls[method]))
+  return "\n".join(lines) + "\n"
+
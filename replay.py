@@ -0,0 +1,282 @@
+##Replays recorded battles from an append-only action log.
+##
+##An action log is a file of JSON objects, one per line, each of which
+##is one of:
+##   {"op": "new", "name": Str, "st": Nat, "max_hp": Nat, "max_mp": Nat}
+##   {"op": "cast_spell", "caster": Nat, "cost": Nat, "damage": Nat,
+##    "enemy": Nat}
+##   {"op": "level_up", "id": Nat, "n": Nat}
+##   {"op": "all_punch", "players": (listof Nat), "enemy": Nat}
+##The world being replayed is a list of Characters. A "new" action adds
+##a Character to the end of it, and the other actions refer to
+##Characters by their position in it.
+##
+##The log is read one line at a time, so replaying it takes memory for
+##the world but not for the log. Every so many actions the world can be
+##saved as a roster snapshot checkpoint, so that a later replay resumes
+##from the nearest checkpoint instead of from the start of the log. Each
+##checkpoint records a SHA-256 digest of the log up to the checkpoint,
+##and a replay only resumes from a checkpoint whose digest matches the
+##log being replayed, so a checkpoint directory shared by several logs,
+##or kept after a log is replaced, never resumes from the wrong one.
+##
+##Usage: python replay.py log [checkpoint_dir [stop]]
+
+import hashlib
+import json
+import os
+import sys
+import time
+from collections import namedtuple
+from role_playing_game import Character, NullSink, all_punch, set_event_sink
+from roster import open_roster, write_roster
+
+##Constants:
+default_checkpoint_every = 100000
+checkpoint_index = "checkpoints.jsonl"
+
+ReplayStats = namedtuple("ReplayStats", ["actions", "replayed", "offset",
+                                         "seconds", "actions_per_second"])
+
+
+def log_action(f, action):
+  '''
+  Appends action to the action log open for writing as f.
+
+  Effects: Writes to f
+
+  log_action: File (dictof Str Any) -> None
+
+  Examples:
+     log_action(f, {"op": "level_up", "id": 0, "n": 1}) => None
+     and the line {"op": "level_up", "id": 0, "n": 1} is written to f
+  '''
+  f.write(json.dumps(action, separators=(",", ":")) + "\n")
+
+
+def read_actions(path, offset=0):
+  '''
+  Produces, one at a time and in order, each action in the action log
+  at path that starts at or after byte offset, along with the byte
+  offset just past it. A final line with no newline is still being
+  written, so it is not produced.
+
+  Effects: Reads a file
+
+  read_actions: Str Nat -> (generatorof (list Nat (dictof Str Any)))
+  '''
+  with open(path, "rb") as f:
+    f.seek(offset)
+    for line in f:
+      if not line.endswith(b"\n"):
+        return
+      offset = offset + len(line)
+      if not line.isspace():
+        yield offset, json.loads(line)
+
+
+def apply_action(world, action):
+  '''
+  Performs action on world.
+
+  Effects: Mutates world
+           Mutates the Characters in world
+
+  apply_action: (listof Character) (dictof Str Any) -> None
+  '''
+  op = action["op"]
+  if op == "cast_spell":
+    world[action["caster"]].cast_spell(action["cost"], action["damage"],
+                                       world[action["enemy"]])
+  elif op == "all_punch":
+    all_punch(list(map(world.__getitem__, action["players"])),
+              world[action["enemy"]])
+  elif op == "level_up":
+    world[action["id"]].level_up(action.get("n", 1))
+  elif op == "new":
+    world.append(Character(action["name"], action["st"],
+                           action["max_hp"], action["max_mp"]))
+  else:
+    raise ValueError("unknown action {0!r}".format(op))
+
+
+def read_checkpoints(checkpoint_dir):
+  '''
+  Returns the entries of the checkpoints in checkpoint_dir that
+  record a digest of their log, in the order they were saved.
+
+  Effects: Reads a file
+
+  read_checkpoints: Str -> (listof (dictof Str Any))
+  '''
+  checkpoints = []
+  path = os.path.join(checkpoint_dir, checkpoint_index)
+  if os.path.exists(path):
+    with open(path) as f:
+      for line in f:
+        if line.strip():
+          entry = json.loads(line)
+          if "digest" in entry:
+            checkpoints.append(entry)
+  return checkpoints
+
+
+def hash_log(path, digest, start, end):
+  '''
+  Updates digest, a hashlib hash, with the bytes of the log at path
+  from byte start up to byte end, or up to the end of the log if it is
+  shorter, and returns digest.
+
+  Effects: Reads a file
+           Mutates digest
+
+  hash_log: Str Hash Nat Nat -> Hash
+  '''
+  with open(path, "rb") as f:
+    f.seek(start)
+    left = end - start
+    while left > 0:
+      chunk = f.read(min(left, 1 << 20))
+      if not chunk:
+        break
+      digest.update(chunk)
+      left = left - len(chunk)
+  return digest
+
+
+def find_checkpoint(path, checkpoints, stop):
+  '''
+  Returns the entry of the latest of checkpoints that is not past stop
+  (if stop is not None) and whose digest matches the log at path, or
+  None if there is none, along with a hashlib hash of the log up to
+  that entry's offset (the empty hash if there is none). The log is
+  read once, up to the last offset checked.
+
+  Effects: Reads a file
+
+  find_checkpoint: Str (listof (dictof Str Any)) (anyof Nat None)
+                   -> (list (anyof (dictof Str Any) None) Hash)
+  '''
+  usable = sorted(filter(lambda entry: stop is None or entry["actions"] <= stop,
+                         checkpoints),
+                  key=lambda entry: entry["offset"])
+  digest = hashlib.sha256()
+  found = [None, digest.copy()]
+  hashed = 0
+  for entry in usable:
+    hash_log(path, digest, hashed, entry["offset"])
+    hashed = entry["offset"]
+    if digest.hexdigest() == entry["digest"]:
+      found = [entry, digest.copy()]
+  return found
+
+
+def save_checkpoint(checkpoint_dir, world, actions, offset, digest):
+  '''
+  Saves world, as it is after replaying actions actions ending at byte
+  offset of a log whose bytes up to offset have the hex SHA-256 digest
+  digest, as a checkpoint in checkpoint_dir.
+
+  Effects: Writes files
+
+  save_checkpoint: Str (listof Character) Nat Nat Str -> None
+  '''
+  name = "checkpoint-{0}-{1}.roster".format(actions, digest[:16])
+  path = os.path.join(checkpoint_dir, name)
+  write_roster(path + ".tmp", world)
+  os.replace(path + ".tmp", path)
+  entry = {"actions": actions, "offset": offset, "digest": digest,
+           "roster": name}
+  with open(os.path.join(checkpoint_dir, checkpoint_index), "a") as f:
+    f.write(json.dumps(entry) + "\n")
+
+
+def load_checkpoint(checkpoint_dir, entry):
+  '''
+  Returns the world saved in the checkpoint entry of checkpoint_dir.
+
+  Effects: Reads a file
+
+  load_checkpoint: Str (dictof Str Any) -> (listof Character)
+  '''
+  with open_roster(os.path.join(checkpoint_dir, entry["roster"])) as saved:
+    return list(map(saved.__getitem__, range(len(saved))))
+
+
+def replay(path, checkpoint_dir=None,
+           checkpoint_every=default_checkpoint_every, stop=None):
+  '''
+  Returns the world produced by replaying the first stop actions of
+  the action log at path, or all of them if stop is None, along with
+  ReplayStats for the replay. If checkpoint_dir is not None, the
+  replay starts from the latest checkpoint there of this log that is
+  not past stop, and a checkpoint is saved there after every
+  checkpoint_every actions that are replayed.
+
+  Effects: Reads files
+           Writes files in checkpoint_dir
+
+  replay: Str (anyof Str None) Nat (anyof Nat None)
+          -> (list (listof Character) ReplayStats)
+  Requires: checkpoint_every > 0
+  '''
+  world = []
+  actions = 0
+  offset = 0
+  saved = set()
+  digest = None
+  if checkpoint_dir is not None:
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    checkpoints = read_checkpoints(checkpoint_dir)
+    saved = set(map(lambda entry: entry["digest"], checkpoints))
+    entry, digest = find_checkpoint(path, checkpoints, stop)
+    if entry is not None:
+      actions = entry["actions"]
+      offset = entry["offset"]
+      world = load_checkpoint(checkpoint_dir, entry)
+  restored = actions
+  hashed = offset
+  start = time.perf_counter()
+  for end, action in read_actions(path, offset):
+    if stop is not None and actions >= stop:
+      break
+    apply_action(world, action)
+    actions = actions + 1
+    offset = end
+    if checkpoint_dir is not None and actions % checkpoint_every == 0:
+      hash_log(path, digest, hashed, offset)
+      hashed = offset
+      if digest.hexdigest() not in saved:
+        save_checkpoint(checkpoint_dir, world, actions, offset,
+                        digest.hexdigest())
+  seconds = time.perf_counter() - start
+  replayed = actions - restored
+  rate = replayed / seconds if seconds > 0 else 0.0
+  return [world, ReplayStats(actions, replayed, offset, seconds, rate)]
+
+
+def main(args):
+  '''
+  Replays the action log named by args[0], with checkpoints in
+  args[1] if it is given, up to args[2] actions if it is given, and
+  prints how fast it went. Events are discarded during the replay.
+
+  Effects: Prints to screen
+           Reads and writes files
+
+  main: (listof Str) -> None
+  '''
+  checkpoint_dir = args[1] if len(args) > 1 else None
+  stop = int(args[2]) if len(args) > 2 else None
+  old_sink = set_event_sink(NullSink())
+  try:
+    world, stats = replay(args[0], checkpoint_dir, stop=stop)
+  finally:
+    set_event_sink(old_sink)
+  print("{0} characters after {1} actions".format(len(world), stats.actions))
+  print("replayed {0} actions in {1:.3f} s ({2:.0f} actions/s)".format(
+    stats.replayed, stats.seconds, stats.actions_per_second))
+
+
+if __name__ == "__main__":
+  main(sys.argv[1:])
@@ -0,0 +1,1412 @@
+##The game engine: Character, all_punch and the constants they use.
+##Importing this module has no side effects; the examples and tests
+##are in Role Playing Game.py.
+
+import math
+from array import array
+from bisect import bisect_left
+from collections import deque, namedtuple
+from itertools import accumulate, compress, repeat
+from operator import add, mul, sub
+
+##Constants:
+increase_factor = 0.1
+punch_factor_st = 2
+growth_memo_min = 16
+growth_tables_max = 4096
+
+
+##The layout of a Character's string representation.
+status_format = ("{0.name}"
+                 "\nLevel: {0.level}"
+                 "\nStrength: {0.st}"
+                 "\nHP: {0.hp}/{0.max_hp}"
+                 "\nMP: {0.mp}/{0.max_mp}")
+
+
+##Events:
+##Mutating methods report what happened to them as events, sent to 
+##event_sink by calling event_sink.emit(kind, source, target, cost, amount).
+##The kinds of event are:
+##   "spell_failed"  - source had less mp than cost
+##   "spell_blocked" - target was already defeated
+##   "spell_hit"     - source spent cost mp dealing amount damage to target
+##   "spell_kill"    - as "spell_hit", and target was defeated
+##   "punch_hit"     - the list of characters source dealt amount 
+##                     damage to target
+##   "punch_kill"    - as "punch_hit", and target was defeated
+##   "level_up"      - source gained amount levels
+Event = namedtuple("Event", ["kind", "source", "target", "cost", "amount"])
+
+##The text a StdoutSink prints for each kind of event.
+event_messages = {"spell_failed": "Not enough MP",
+                  "spell_blocked": "Enemy defeated",
+                  "spell_kill": "Enemy defeated"}
+
+
+class StdoutSink:
+  '''
+  An event sink that prints the message in event_messages for each
+  event that has one, and ignores every other event.
+  '''
+  def emit(self, kind, source, target, cost, amount):
+    '''
+    Prints the message for an event of kind kind, if there is one.
+    
+    Effects: Prints to screen
+    
+    emit: StdoutSink Str Any Any Nat Nat -> None
+    '''
+    message = event_messages.get(kind)
+    if message is not None:
+      print(message)
+
+
+class NullSink:
+  '''
+  An event sink that ignores every event.
+  '''
+  def emit(self, kind, source, target, cost, amount):
+    '''
+    Does nothing.
+    
+    emit: NullSink Str Any Any Nat Nat -> None
+    '''
+    pass
+
+
+class RingBufferSink:
+  '''
+  Fields: 
+     events(dequeof Event)
+     dropped(Nat)
+  
+  An event sink that keeps the most recent capacity events, so they
+  can be drained in batches. dropped counts the events that were 
+  discarded because the buffer was full.
+  '''
+  def __init__(self, capacity):
+    '''
+    Initializes a RingBufferSink object self that holds at most
+    capacity events.
+    
+    Effects: Mutates self
+    
+    __init__: RingBufferSink Nat -> None
+    Requires: capacity > 0
+    '''
+    self.events = deque(maxlen=capacity)
+    self.dropped = 0
+
+
+  def emit(self, kind, source, target, cost, amount):
+    '''
+    Adds an Event to self, discarding the oldest Event in self if
+    self is full.
+    
+    Effects: Mutates self
+    
+    emit: RingBufferSink Str Any Any Nat Nat -> None
+    '''
+    if len(self.events) == self.events.maxlen:
+      self.dropped = self.dropped + 1
+    self.events.append(Event(kind, source, target, cost, amount))
+
+
+  def drain(self, limit=None):
+    '''
+    Removes and returns the oldest limit events in self, oldest 
+    first, or all of the events in self if limit is None.
+    
+    Effects: Mutates self
+    
+    drain: RingBufferSink (anyof Nat None) -> (listof Event)
+    '''
+    events = self.events
+    if limit is None or limit >= len(events):
+      drained = list(events)
+      events.clear()
+    else:
+      drained = list(map(lambda i: events.popleft(), range(limit)))
+    return drained
+
+
+event_sink = StdoutSink()
+
+
+def set_event_sink(sink):
+  '''
+  Sends all future events to sink, and returns the sink they were
+  being sent to.
+  
+  Effects: Mutates event_sink
+  
+  set_event_sink: Sink -> Sink
+  '''
+  global event_sink
+  previous = event_sink
+  event_sink = sink
+  return previous
+
+
+##Transactions:
+##While a Transaction is open, cast_spell, level_up, all_punch,
+##all_punch_detailed, Party.punch and cast_many save the old value of
+##each field they are about to mutate in the innermost open
+##Transaction, on top of the stack _journal. Rolling it back puts
+##those values back, so undoing a move costs time proportional to the
+##fields it changed. Events that were sent are not taken back.
+_journal = []
+
+
+class Transaction:
+  '''
+  Fields: 
+     entries(listof (list Any Str Any))
+  
+  A journal of the fields mutated while self is open, each entry
+  being the object, the name of the field and its old value. A 
+  Transaction is opened by a with statement, and is committed at the
+  end of it, or rolled back if the with statement raises, unless it
+  was already ended by calling commit or rollback. Committing a 
+  Transaction inside another one keeps its entries in the outer 
+  Transaction, so rolling back the outer one undoes both. Fields
+  assigned directly, rather than by the methods above, are not saved.
+  
+  Requires: 
+     Transactions are ended innermost first.
+  '''
+  def __init__(self):
+    '''
+    Initializes a Transaction object self with no entries.
+    
+    Effects: Mutates self
+    
+    __init__: Transaction -> None
+    '''
+    self.entries = []
+
+
+  def __enter__(self):
+    '''
+    Opens self, so that later mutations are saved in it, and 
+    returns self.
+    
+    Effects: Mutates _journal
+    
+    __enter__: Transaction -> Transaction
+    '''
+    _journal.append(self)
+    return self
+
+
+  def __exit__(self, kind, value, traceback):
+    '''
+    Commits self at the end of a with statement, or rolls it back if
+    the with statement raised, if self is still open. Transactions
+    opened inside self and left open are committed into self first,
+    so they are kept or undone along with it.
+    
+    Effects: Mutates _journal
+             Mutates the objects in self.entries
+    
+    __exit__: Transaction Any Any Any -> None
+    '''
+    if self in _journal:
+      while _journal[-1] is not self:
+        _journal[-1].commit()
+      if kind is None:
+        self.commit()
+      else:
+        self.rollback()
+
+
+  def save(self, obj, *fields):
+    '''
+    Saves the current value of each of fields of obj in self.
+    
+    Effects: Mutates self
+    
+    save: Transaction Any Str ... -> None
+    '''
+    entries = self.entries
+    for field in fields:
+      entries.append((obj, field, getattr(obj, field)))
+
+
+  def end(self):
+    '''
+    Closes self, which must be the innermost open Transaction. Raises
+    ValueError otherwise.
+    
+    Effects: Mutates _journal
+    
+    end: Transaction -> None
+    '''
+    if not _journal or _journal[-1] is not self:
+      raise ValueError("only the innermost open Transaction can end")
+    _journal.pop()
+
+
+  def commit(self):
+    '''
+    Closes self, keeping its mutations. If another Transaction is 
+    still open, the entries of self are moved into it.
+    
+    Effects: Mutates self
+             Mutates _journal
+    
+    commit: Transaction -> None
+    '''
+    self.end()
+    if _journal:
+      _journal[-1].entries.extend(self.entries)
+    self.entries = []
+
+
+  def rollback(self):
+    '''
+    Closes self, undoing every mutation saved in it, latest first,
+    and then touches each Character that was mutated, once. Only
+    Characters are saved, and a Party updates its total_st as its
+    members are touched, so no Party is recomputed.
+    
+    Effects: Mutates self
+             Mutates _journal
+             Mutates the objects in self.entries
+    
+    rollback: Transaction -> None
+    
+    Examples:
+       c = Character("Test", 1, 4, 5)
+       e = Character("Test", 1, 4, 5)
+       with Transaction() as t:
+         c.cast_spell(3, 2, e)
+         t.rollback()
+       and c and e are not mutated.
+    '''
+    self.end()
+    touched = {}
+    for obj, field, old in reversed(self.entries):
+      setattr(obj, field, old)
+      touched[id(obj)] = obj
+    for obj in touched.values():
+      obj.touch()
+    self.entries = []
+
+
+
+class Character:
+  ''' 
+  Fields: 
+     name(Str) 
+     st(Nat)
+     hp(Nat)
+     max_hp(Nat)
+     mp(Nat)
+     max_mp(Nat)
+     level(Nat)
+     
+  Requires:  
+     st, max_hp are both strictly greater than 0.
+  
+  Fields are stored in __slots__ rather than a per-instance __dict__,
+  so that each Character takes as little memory as possible.
+  
+  A Character is hashable. Its hash, its fingerprint, is cached in
+  _hash, and its status text is cached in _text, until self.touch()
+  is called, which cast_spell, level_up and all_punch do whenever
+  they mutate a Character. Code that assigns to a field directly must
+  call touch() afterwards, and a Character must not be mutated while
+  it is in a set or is a dictionary key. touch() also tells each
+  observer in _observers, the World and the Parties self belongs to,
+  that self has changed. _observers is None rather than an empty
+  list while there are none, to keep each Character small.
+  '''
+  __slots__ = ("name", "st", "hp", "max_hp", "mp", "max_mp", "level",
+               "_hash", "_text", "_observers")
+
+  def __init__(self, new_name, strength, 
+               maximumHP, maximumMP):
+    '''
+    Initializes a Character object self with 
+    name new_name, st strength,
+    hp and max_hp of maximumHP, and
+    mp and max_mp of maximumMP, and
+    level should start at 1.
+    
+    Effects: Mutates self
+    
+    __init__: Character Str Nat Nat Nat -> None
+    Requires
+      0 < strength, maximumHP, level
+      maximumHP > hp
+      maximumMP > mp
+    '''
+    self.name = new_name
+    self.st = strength
+    self.hp = maximumHP
+    self.max_hp = maximumHP
+    self.mp = maximumMP
+    self.max_mp = maximumMP
+    self.level = 1
+    self._hash = None
+    self._text = None
+    self._observers = None
+
+    
+  def __eq__(self, other):
+    '''
+    Returns True if self and other are equal and False otherwise
+    
+    __eq__: Character Any -> Bool
+    '''
+    if not isinstance(other, Character):
+      return False
+    if self._hash is not None and other._hash is not None and \
+       self._hash != other._hash:
+      return False
+    return self.name == other.name and \
+        self.st == other.st and \
+        self.hp == other.hp and \
+        self.max_hp == other.max_hp and \
+        self.mp == other.mp and \
+        self.max_mp == other.max_mp and \
+        self.level == other.level
+
+
+  def __hash__(self):
+    '''
+    Returns the fingerprint of self
+    
+    __hash__: Character -> Int
+    '''
+    if self._hash is None:
+      return self.fingerprint()
+    return self._hash
+
+
+  def fingerprint(self):
+    '''
+    Returns a hash of all of the fields of self, so that equal 
+    Characters have equal fingerprints. The fingerprint is cached 
+    until self is next touched.
+    
+    Effects: Mutates self
+    
+    fingerprint: Character -> Int
+    '''
+    if self._hash is None:
+      self._hash = hash((self.name, self.st, self.hp, self.max_hp,
+                         self.mp, self.max_mp, self.level))
+    return self._hash
+
+
+  def __getstate__(self):
+    '''
+    Returns the fields of self, for copy, deepcopy and pickle. The
+    caches and observers are left out, so a copy of a Character in a
+    World or a Party belongs to neither.
+    
+    __getstate__: Character -> (listof Any)
+    '''
+    return [self.name, self.st, self.hp, self.max_hp, self.mp,
+            self.max_mp, self.level]
+
+
+  def __setstate__(self, state):
+    '''
+    Sets the fields of self from state, as returned by __getstate__,
+    with nothing cached and no observers.
+    
+    Effects: Mutates self
+    
+    __setstate__: Character (listof Any) -> None
+    '''
+    (self.name, self.st, self.hp, self.max_hp, self.mp, self.max_mp,
+     self.level) = state
+    self._hash = None
+    self._text = None
+    self._observers = None
+
+
+  def touch(self):
+    '''
+    Discards the state cached in self, and notifies each observer of
+    self, such as the World and the Parties self belongs to. Must be
+    called whenever a field of self is mutated other than by a method
+    of Character.
+    
+    Effects: Mutates self
+             Mutates the observers of self
+    
+    touch: Character -> None
+    '''
+    self._hash = None
+    self._text = None
+    if self._observers is not None:
+      for observer in self._observers:
+        observer.notify(self)
+
+
+  def add_observer(self, observer):
+    '''
+    Adds observer to the observers of self, so that observer.notify(self)
+    is called whenever self is touched.
+    
+    Effects: Mutates self
+    
+    add_observer: Character Any -> None
+    '''
+    if self._observers is None:
+      self._observers = [observer]
+    else:
+      self._observers.append(observer)
+
+
+  def remove_observer(self, observer):
+    '''
+    Removes observer, the very object, from the observers of self, if
+    it is one.
+    
+    Effects: Mutates self
+    
+    remove_observer: Character Any -> None
+    '''
+    observers = self._observers
+    if observers is not None:
+      observers[:] = [other for other in observers if other is not observer]
+      if not observers:
+        self._observers = None
+
+
+  def observers(self):
+    '''
+    Returns a list of the observers of self.
+    
+    observers: Character -> (listof Any)
+    '''
+    return list(self._observers or ())
+
+  
+  def __repr__(self):
+    '''
+    Returns a string representation of self. It is cached until self
+    is next touched.
+    
+    Effects: Mutates self
+    
+    __repr__: Character -> Str
+    '''
+    if self._text is None:
+      self._text = status_format.format(self)
+    return self._text
+
+  
+  def cast_spell(self, cost, damage, enemy):
+    '''
+    Casts a spell if self is able that requires cost mp to cast and
+    deals damage to enemy. A message is printed if the enemy is 
+    defeated or there was not enough mp to cast the spell. The 
+    messages are printed by sending events to event_sink.
+    
+    Effects: 
+       Prints to screen
+       Mutates self
+       Mutates enemy
+    
+    cast_spell: Character Nat Nat Character -> None
+    
+    Examples:
+       c = Character("Test", 1, 4, 5)
+       e = Character("Test", 1, 4, 5)
+       c.cast_spell(3, 10, e) => None
+       and e.hp is mutated to 0
+       and c.mp is mutated to 2
+       and "Enemy defeated" is printed (no quotes).
+       
+       c = Character("Test", 1, 4, 5)
+       e = Character("Test", 1, 4, 5)
+       c.cast_spell(13, 10, e) => None
+       and "Not enough MP" is printed (no quotes).
+       
+       c = Character("Test", 1, 4, 5)
+       e = Character("Test", 1, 4, 5)
+       c.cast_spell(3, 2, e) => None
+       and e.hp is mutated to 2
+       and c.mp is mutated to 2
+    '''
+    if self.mp < cost:
+      event_sink.emit("spell_failed", self, enemy, cost, damage)
+    if enemy.hp <= 0:
+      event_sink.emit("spell_blocked", self, enemy, cost, damage)
+    if (self.mp >= cost) and (enemy.hp > 0):
+      if _journal:
+        _journal[-1].save(self, "mp")
+        _journal[-1].save(enemy, "hp")
+      self.mp = self.mp - cost
+      enemy.hp = enemy.hp - damage
+      killed = enemy.hp <= 0
+      if killed:
+        enemy.hp = 0
+      self.touch()
+      enemy.touch()
+      if killed:
+        event_sink.emit("spell_kill", self, enemy, cost, damage)
+      else:
+        event_sink.emit("spell_hit", self, enemy, cost, damage)
+
+
+  def level_up(self, n=1):
+    '''
+    Performs n level-ups for self. Each level-up increases stats
+    10% plus 1 via mutation of self. hp and mp stay the same 
+    distance below max_hp and max_mp that they were before. A
+    "level_up" event is sent to event_sink.
+    
+    Effects: Mutates self
+    
+    level_up: Character Nat -> None
+    Requires: n >= 0 (ValueError otherwise)
+    
+    Examples:
+       c = Character("Test", 1, 4, 5)
+       c.level_up() => None
+       and c.level is mutated to 2
+       and c.st is mutated to 2
+       and c.hp is mutated to 5
+       and c.max_hp is mutated to 5
+       and c.mp is mutated to 6
+       and c.max_mp is mutated to 6
+       
+       c = Character("Test", 1, 4, 5)
+       c.level_up(2) => None
+       and c.level is mutated to 3
+       and c.st is mutated to 3
+       and c.hp is mutated to 6
+       and c.max_hp is mutated to 6
+       and c.mp is mutated to 7
+       and c.max_mp is mutated to 7
+    '''
+    if n < 0:
+      raise ValueError("cannot level up {0} times".format(n))
+    if _journal:
+      _journal[-1].save(self, "level", "st", "hp", "max_hp", "mp", "max_mp")
+    self.level = self.level + n
+    if n == 1:
+      st = self.st
+      self.st = st + math.floor(increase_factor * st) + 1
+      max_hp = self.max_hp + math.floor(increase_factor * self.max_hp) + 1
+      max_mp = self.max_mp + math.floor(increase_factor * self.max_mp) + 1
+    else:
+      self.st = grown_stat(self.st, n)
+      max_hp = grown_stat(self.max_hp, n)
+      max_mp = grown_stat(self.max_mp, n)
+    self.hp = self.hp + (max_hp - self.max_hp)
+    self.max_hp = max_hp
+    self.mp = self.mp + (max_mp - self.max_mp)
+    self.max_mp = max_mp
+    self.touch()
+    event_sink.emit("level_up", self, None, 0, n)
+
+
+  def level_up_to(self, target):
+    '''
+    Performs level-ups for self until self is at level target,
+    as level_up does.
+    
+    Effects: Mutates self
+    
+    level_up_to: Character Nat -> None
+    Requires: target >= self.level
+    
+    Examples:
+       c = Character("Test", 1, 4, 5)
+       c.level_up_to(3) => None
+       and c is mutated as c.level_up(2) mutates it.
+    '''
+    self.level_up(target - self.level)
+
+
+##Memoized growth tables: growth_tables[(increase_factor, x)] is the 
+##list of values a stat that starts at x takes on after 0, 1, 2, ...
+##level-ups. Only runs of at least growth_memo_min level-ups are
+##memoized, and the tables are all discarded once there are
+##growth_tables_max of them, so a large roster cannot fill memory.
+growth_tables = {}
+
+
+def grown_stat(x, n):
+  '''
+  Returns the value of a stat that starts at x after n level-ups,
+  each of which increases it 10% plus 1. For n of at least
+  growth_memo_min, values are looked up in, and added to,
+  growth_tables.
+  
+  Effects: Mutates growth_tables
+  
+  grown_stat: Nat Nat -> Nat
+  
+  Examples:
+     grown_stat(10, 0) => 10
+     grown_stat(10, 1) => 12
+     grown_stat(10, 3) => 16
+  '''
+  if n == 1:
+    return x + math.floor(increase_factor * x) + 1
+  if n < growth_memo_min:
+    for i in range(n):
+      x = x + math.floor(increase_factor * x) + 1
+    return x
+  key = (increase_factor, x)
+  table = growth_tables.get(key)
+  if table is None:
+    if len(growth_tables) >= growth_tables_max:
+      growth_tables.clear()
+    table = [x]
+    growth_tables[key] = table
+  while len(table) <= n:
+    last = table[-1]
+    table.append(last + math.floor(increase_factor * last) + 1)
+  return table[n]
+
+
+def all_punch(players, enemy):
+  '''
+  Returns None but simulates all the characters (players) 
+  in the list of characters, players, punching an enemy 
+  character. Each Character in players will hit the enemy
+  mutating enemy, by dealing damage to them and thus,
+  decreasing their hp by twice the, st, strength statistic
+  of each individual Character in players, and if the
+  enemy runs out of hp, their hp is set to 0, and each 
+  character in players is mutated by levelling up. A 
+  "punch_hit" or "punch_kill" event is sent to event_sink.
+  
+  Effects: Mutates players
+           Mutates enemy
+  
+  all_punch: (listof Character) Character -> None
+  Requires: enemy cannot be a member of the list of 
+              characters, players. 
+            for each player in the list and the enemy
+              the following must hold:
+               0 < strength, maximumHP, level
+               maximumHP > hp
+               maximumMP > mp
+  
+  Examples:
+     d1 = Character("C1", 10, 10, 10)
+     d2 = Character("C2", 1, 10, 10)
+     d3 = Character("C3", 20, 20, 10)
+     e2 = Character("E2", 20, 20, 10)
+     L = [d1, d2, d3]
+     all_punch(L, e2) => None
+     and e.hp is mutated to 0
+     and all of all of d1, d2, d3 have levelled up.
+     
+     all_punch([], e2) => None
+     and no mutation occurs
+  '''
+  if _journal:
+    _journal[-1].save(enemy, "hp")
+  total = 0
+  for character in players:
+    player_st = (character.st * punch_factor_st)
+    enemy.hp = enemy.hp - player_st
+    total = total + player_st
+  if enemy.hp <= 0:
+    enemy.hp = 0
+  enemy.touch()
+  if enemy.hp <= 0:
+    event_sink.emit("punch_kill", players, enemy, 0, total)
+    for character in players:
+      character.level_up()
+  else:
+    event_sink.emit("punch_hit", players, enemy, 0, total)
+
+
+def render_roster(characters, out):
+  '''
+  Writes the string representation of each Character in characters
+  to out, each followed by a newline, exactly as printing each of
+  them in turn would. The text is joined and written all at once, 
+  and each Character's text is reused from its cache if it has not
+  been touched since it was last rendered.
+  
+  Effects: Writes to out
+           Mutates the Characters in characters
+  
+  render_roster: (iterof Character) File -> None
+  
+  Examples:
+     render_roster([Character("Test", 1, 4, 5)], sys.stdout) => None
+     and the following is printed:
+     Test
+     Level: 1
+     Strength: 1
+     HP: 4/4
+     MP: 5/5
+  '''
+  blocks = list(map(repr, characters))
+  if blocks:
+    blocks.append("")
+    out.write("\n".join(blocks))
+
+
+PunchResult = namedtuple("PunchResult", ["defeated", "killer", "overkill",
+                                         "contributors"])
+
+
+def all_punch_detailed(players, enemy):
+  '''
+  Mutates players and enemy, and sends the same events, exactly as
+  all_punch(players, enemy) would, and returns a PunchResult saying 
+  how the enemy was defeated:
+     defeated is True if enemy has no hp left, in which case players
+       were levelled up,
+     killer is the index in players of the attacker whose punch took
+       enemy's hp to 0 or less, or None if no punch did, either
+       because enemy survived or was already defeated,
+     overkill is the damage dealt beyond what enemy had left, and
+     contributors is the range of indices of the attackers who
+       punched before enemy was defeated, including killer.
+  The killer is found by binary search on the prefix sums of the 
+  attackers' damage.
+  
+  Effects: Mutates players
+           Mutates enemy
+  
+  all_punch_detailed: (listof Character) Character -> PunchResult
+  Requires: as all_punch
+            punch_factor_st is an integer
+  
+  Examples:
+     all_punch_detailed([d1, d2, d3], e2) 
+       => PunchResult(True, 0, 42, range(0, 1))
+     and d1, d2, d3 and e2 are mutated as all_punch([d1, d2, d3], e2)
+     would mutate them.
+  '''
+  hp = enemy.hp
+  damage = list(accumulate(map(lambda character: 
+                                 character.st * punch_factor_st, players)))
+  total = damage[-1] if damage else 0
+  if hp <= 0:
+    result = PunchResult(True, None, total, range(0))
+  elif total >= hp:
+    killer = bisect_left(damage, hp)
+    result = PunchResult(True, killer, total - hp, range(killer + 1))
+  else:
+    result = PunchResult(False, None, 0, range(len(players)))
+  if _journal:
+    _journal[-1].save(enemy, "hp")
+  enemy.hp = hp - total
+  if enemy.hp <= 0:
+    enemy.hp = 0
+  enemy.touch()
+  if enemy.hp <= 0:
+    event_sink.emit("punch_kill", players, enemy, 0, total)
+    for character in players:
+      character.level_up()
+  else:
+    event_sink.emit("punch_hit", players, enemy, 0, total)
+  return result
+
+
+class Party:
+  '''
+  Fields: 
+     members(listof Character)
+     total_st(Nat)
+  
+  A standing party of Characters that punches enemies together, as
+  all_punch does. total_st is the sum of the st of members, kept up
+  to date as members join, leave and level up, so that a punch that
+  does not defeat its enemy takes the same time however big self is.
+  
+  self is an observer of each of its members, so touching a member, as
+  every method that mutates a Character does, updates total_st by
+  the change in its st, except while self.level_up() levels up every
+  member and updates total_st once. Only the st of a CharacterRow can
+  change without it being touched, so code that changes the st of a 
+  member that way must call self.touch() afterwards.
+  '''
+  def __init__(self, members=()):
+    '''
+    Initializes a Party object self with the Characters in members,
+    in order.
+    
+    Effects: Mutates self
+             Mutates the Characters in members
+    
+    __init__: Party (listof Character) -> None
+    '''
+    self.members = []
+    self.total_st = 0
+    # _counted[id(c)] is [c, the st of c counted in total_st, and the
+    # number of times c is a member].
+    self._counted = {}
+    self._levelling = False
+    for character in members:
+      self.join(character)
+
+
+  def __len__(self):
+    '''
+    Returns the number of members of self
+    
+    __len__: Party -> Nat
+    '''
+    return len(self.members)
+
+
+  def touch(self):
+    '''
+    Recomputes total_st from the members of self. Must be called 
+    whenever the st of a member is mutated without touching it.
+    
+    Effects: Mutates self
+    
+    touch: Party -> None
+    '''
+    self.total_st = sum(map(lambda character: character.st, self.members))
+    for counted in self._counted.values():
+      counted[1] = counted[0].st
+
+
+  def notify(self, character):
+    '''
+    Updates total_st for the current st of character. Called by
+    character.touch(). Does nothing while self.level_up() is running,
+    since it updates total_st itself.
+    
+    Effects: Mutates self
+    
+    notify: Party Character -> None
+    Requires: character is a member of self
+    '''
+    if self._levelling:
+      return
+    counted = self._counted[id(character)]
+    st = character.st
+    if st != counted[1]:
+      self.total_st = self.total_st + (st - counted[1]) * counted[2]
+      counted[1] = st
+
+
+  def join(self, character):
+    '''
+    Adds character as the last member of self.
+    
+    Effects: Mutates self
+             Mutates character
+    
+    join: Party Character -> None
+    '''
+    self.members.append(character)
+    self.total_st = self.total_st + character.st
+    counted = self._counted.get(id(character))
+    if counted is not None:
+      counted[2] = counted[2] + 1
+      return
+    self._counted[id(character)] = [character, character.st, 1]
+    character.add_observer(self)
+
+
+  def leave(self, character):
+    '''
+    Removes character, the very object and not just one equal to it,
+    from the members of self. Raises ValueError if it is not a member.
+    
+    Effects: Mutates self
+             Mutates character
+    
+    leave: Party Character -> None
+    '''
+    members = self.members
+    for i in range(len(members)):
+      if members[i] is character:
+        del members[i]
+        self.total_st = self.total_st - character.st
+        counted = self._counted[id(character)]
+        counted[2] = counted[2] - 1
+        if counted[2] == 0:
+          del self._counted[id(character)]
+          character.remove_observer(self)
+        return
+    raise ValueError("{0} is not in the party".format(character.name))
+
+
+  def level_up(self):
+    '''
+    Levels up every member of self, once for each time it is a member,
+    as character.level_up() for each character in members would, and
+    then updates total_st once for all of them.
+    
+    Effects: Mutates self
+             Mutates the members of self
+    
+    level_up: Party -> None
+    
+    Examples:
+       party = Party([Character("C1", 10, 10, 10)])
+       party.level_up() => None
+       and party.members[0] and party.total_st are mutated to 
+       Character("C1", 12, 12, 12) and 12
+    '''
+    self._levelling = True
+    try:
+      for character in self.members:
+        character.level_up()
+    finally:
+      self._levelling = False
+      total = 0
+      for counted in self._counted.values():
+        counted[1] = counted[0].st
+        total = total + counted[1] * counted[2]
+      self.total_st = total
+
+
+  def punch(self, enemy):
+    '''
+    Makes every member of self punch enemy, mutating the members,
+    enemy and event_sink exactly as all_punch(self.members, enemy) 
+    would. If enemy is defeated, every member is levelled up with
+    self.level_up(), which updates total_st.
+    
+    Effects: Mutates self
+             Mutates the members of self
+             Mutates enemy
+    
+    punch: Party Character -> None
+    Requires: enemy is not a member of self
+              punch_factor_st is an integer, so that damage adds up
+                exactly as it does in all_punch
+    
+    Examples:
+       party = Party([d1, d2, d3])
+       party.punch(e2) => None
+       and d1, d2, d3 and e2 are mutated as all_punch([d1, d2, d3], e2)
+       would mutate them.
+    '''
+    members = self.members
+    total = self.total_st * punch_factor_st
+    if _journal:
+      _journal[-1].save(enemy, "hp")
+    enemy.hp = enemy.hp - total
+    if enemy.hp <= 0:
+      enemy.hp = 0
+    enemy.touch()
+    if enemy.hp <= 0:
+      event_sink.emit("punch_kill", members, enemy, 0, total)
+      self.level_up()
+    else:
+      event_sink.emit("punch_hit", members, enemy, 0, total)
+
+
+##Outcomes of a cast in cast_many. cast_not_enough_mp and 
+##cast_already_defeated may be combined with |.
+cast_hit = 0
+cast_not_enough_mp = 1
+cast_already_defeated = 2
+cast_kill = 4
+
+
+def cast_many(casts):
+  '''
+  Returns an array holding the outcome of each cast in casts, after
+  applying the casts in order. A cast (caster, cost, damage, enemy)
+  mutates caster and enemy exactly as caster.cast_spell(cost, damage,
+  enemy) would, but nothing is printed and no events are sent to 
+  event_sink. Its outcome is:
+     cast_not_enough_mp if caster had less than cost mp,
+     cast_already_defeated if enemy had no hp left,
+     cast_not_enough_mp | cast_already_defeated if both were true,
+     cast_kill if the spell defeated enemy, and
+     cast_hit otherwise.
+  
+  Effects: Mutates the casters and enemies in casts
+  
+  cast_many: (iterof (list Character Nat Nat Character)) 
+             -> (arrayof Nat)
+  
+  Examples:
+     c = Character("Test", 1, 4, 5)
+     e = Character("Test", 1, 4, 5)
+     cast_many([(c, 3, 2, e), (c, 3, 2, e), (c, 1, 2, e)])
+       => array("B", [cast_hit, cast_not_enough_mp, cast_kill])
+     and e.hp is mutated to 0
+     and c.mp is mutated to 1
+  '''
+  outcomes = array("B")
+  record = outcomes.append
+  for caster, cost, damage, enemy in casts:
+    mp = caster.mp
+    hp = enemy.hp
+    if mp < cost:
+      if hp <= 0:
+        record(cast_not_enough_mp | cast_already_defeated)
+      else:
+        record(cast_not_enough_mp)
+    elif hp <= 0:
+      record(cast_already_defeated)
+    else:
+      if _journal:
+        _journal[-1].save(caster, "mp")
+        _journal[-1].save(enemy, "hp")
+      caster.mp = mp - cost
+      hp = hp - damage
+      if hp <= 0:
+        enemy.hp = 0
+        record(cast_kill)
+      else:
+        enemy.hp = hp
+        record(cast_hit)
+      caster.touch()
+      enemy.touch()
+  return outcomes
+
+
+def _column_property(field):
+  '''
+  Returns a property that reads and writes column field of the
+  CharacterPool that a CharacterRow belongs to.
+  
+  _column_property: Str -> Property
+  '''
+  def get(self):
+    return getattr(self._pool, field)[self._index]
+  def set(self, value):
+    getattr(self._pool, field)[self._index] = value
+  return property(get, set)
+
+
+class CharacterRow(Character):
+  '''
+  Fields: 
+     _pool(CharacterPool)
+     _index(Nat)
+  
+  A view of one row of a CharacterPool that behaves like a Character.
+  Reading or mutating name, st, hp, max_hp, mp, max_mp or level of a
+  CharacterRow reads or mutates that row of the pool.
+  
+  Requires: 
+     0 <= _index < len(_pool)
+  '''
+  __slots__ = ("_pool", "_index")
+
+  def __init__(self, pool, index):
+    '''
+    Initializes a CharacterRow object self viewing row index of pool.
+    
+    Effects: Mutates self
+    
+    __init__: CharacterRow CharacterPool Nat -> None
+    '''
+    self._pool = pool
+    self._index = index
+    self._hash = None
+    self._text = None
+    self._observers = None
+
+
+  def fingerprint(self):
+    '''
+    Returns a hash of all of the fields of self. Unlike a Character, 
+    a CharacterRow does not cache its fingerprint, since its pool 
+    can be mutated without touching it.
+    
+    fingerprint: CharacterRow -> Int
+    '''
+    return hash((self.name, self.st, self.hp, self.max_hp,
+                 self.mp, self.max_mp, self.level))
+
+
+  def __repr__(self):
+    '''
+    Returns a string representation of self, laid out as it is for a
+    Character. It is not cached, for the same reason as fingerprint.
+    
+    __repr__: CharacterRow -> Str
+    '''
+    return status_format.format(self)
+
+
+  def __getstate__(self):
+    '''
+    Returns the pool and index of self, for copy, deepcopy and pickle,
+    so a copy views the same row, of a copy of the pool if it is deep.
+    
+    __getstate__: CharacterRow -> (list CharacterPool Nat)
+    '''
+    return [self._pool, self._index]
+
+
+  def __setstate__(self, state):
+    '''
+    Sets the pool and index of self from state, as returned by 
+    __getstate__, with nothing cached and no observers.
+    
+    Effects: Mutates self
+    
+    __setstate__: CharacterRow (list CharacterPool Nat) -> None
+    '''
+    self._pool, self._index = state
+    self._hash = None
+    self._text = None
+    self._observers = None
+
+  name = _column_property("names")
+  st = _column_property("st")
+  hp = _column_property("hp")
+  max_hp = _column_property("max_hp")
+  mp = _column_property("mp")
+  max_mp = _column_property("max_mp")
+  level = _column_property("level")
+
+
+class CharacterPool:
+  '''
+  Fields: 
+     names(listof Str)
+     st(arrayof Nat)
+     hp(arrayof Nat)
+     max_hp(arrayof Nat)
+     mp(arrayof Nat)
+     max_mp(arrayof Nat)
+     level(arrayof Nat)
+  
+  A roster of characters stored column by column, so that a whole
+  roster can be levelled up one column at a time instead of one
+  Character at a time. Row i of the pool is the character with name
+  names[i], st st[i], hp hp[i], and so on.
+  
+  Requires: 
+     all of the fields have the same length.
+  '''
+  def __init__(self, characters=()):
+    '''
+    Initializes a CharacterPool object self holding a copy of the
+    stats of each Character in characters, in order.
+    
+    Effects: Mutates self
+    
+    __init__: CharacterPool (listof Character) -> None
+    '''
+    self.names = []
+    self.st = array("q")
+    self.hp = array("q")
+    self.max_hp = array("q")
+    self.mp = array("q")
+    self.max_mp = array("q")
+    self.level = array("q")
+    for character in characters:
+      self.append(character)
+
+
+  def __len__(self):
+    '''
+    Returns the number of characters in self
+    
+    __len__: CharacterPool -> Nat
+    '''
+    return len(self.names)
+
+
+  def __getitem__(self, index):
+    '''
+    Returns a CharacterRow viewing row index of self. Negative
+    indices count from the end, as they do for lists.
+    
+    __getitem__: CharacterPool Int -> CharacterRow
+    
+    Examples:
+       p = CharacterPool([Character("Test", 1, 4, 5)])
+       p[0] == Character("Test", 1, 4, 5) => True
+    '''
+    return CharacterRow(self, range(len(self.names))[index])
+
+
+  def append(self, character):
+    '''
+    Adds a copy of the stats of character as the last row of self.
+    
+    Effects: Mutates self
+    
+    append: CharacterPool Character -> None
+    '''
+    self.names.append(character.name)
+    self.st.append(character.st)
+    self.hp.append(character.hp)
+    self.max_hp.append(character.max_hp)
+    self.mp.append(character.mp)
+    self.max_mp.append(character.max_mp)
+    self.level.append(character.level)
+
+
+  def add(self, new_name, strength, maximumHP, maximumMP):
+    '''
+    Adds a new level 1 character to the end of self, as 
+    Character(new_name, strength, maximumHP, maximumMP) would 
+    create it, and returns a CharacterRow viewing it.
+    
+    Effects: Mutates self
+    
+    add: CharacterPool Str Nat Nat Nat -> CharacterRow
+    '''
+    self.append(Character(new_name, strength, maximumHP, maximumMP))
+    return self[-1]
+
+
+  def level_up(self, mask=None):
+    '''
+    Performs a level-up for every row i of self for which mask[i]
+    is True, or for every row of self if mask is None. Stats of
+    the selected rows increase 10% plus 1, exactly as 
+    Character.level_up increases them. The columns are updated in
+    place, with numpy if it is installed.
+    
+    Effects: Mutates self
+    
+    level_up: CharacterPool (anyof (listof Bool) None) -> None
+    Requires: 
+       if mask is not None, len(mask) == len(self)
+    
+    Examples:
+       p = CharacterPool([Character("C1", 10, 10, 10),
+                          Character("C2", 1, 12, 13)])
+       p.level_up([True, False]) => None
+       and p[0] is mutated as Character.level_up mutates C1
+       and p[1] is not mutated.
+    '''
+    if not self.names:
+      return
+    numpy = _numpy()
+    if numpy is not None:
+      self._level_up_numpy(numpy, mask)
+      return
+    floor = math.floor
+    factor = increase_factor
+    if mask is not None and all(mask):
+      mask = None
+    if mask is not None:
+      st = self.st
+      max_hp = self.max_hp
+      max_mp = self.max_mp
+      for i in compress(range(len(self.names)), mask):
+        self.level[i] = self.level[i] + 1
+        x = st[i]
+        st[i] = x + floor(factor * x) + 1
+        x = floor(factor * max_hp[i]) + 1
+        max_hp[i] = max_hp[i] + x
+        self.hp[i] = self.hp[i] + x
+        x = floor(factor * max_mp[i]) + 1
+        max_mp[i] = max_mp[i] + x
+        self.mp[i] = self.mp[i] + x
+      return
+    self.level[:] = array("q", [x + 1 for x in self.level.tolist()])
+    for column, below in ((self.st, None), (self.max_hp, self.hp),
+                          (self.max_mp, self.mp)):
+      old = column.tolist()
+      increase = [floor(factor * x) + 1 for x in old]
+      column[:] = array("q", list(map(add, old, increase)))
+      if below is not None:
+        below[:] = array("q", list(map(add, below.tolist(), increase)))
+
+
+  def _level_up_numpy(self, numpy, mask):
+    '''
+    Performs level_up(mask) for self with numpy, working on the
+    columns of self in place.
+    
+    Effects: Mutates self
+    
+    _level_up_numpy: CharacterPool Module (anyof (listof Bool) None) 
+                     -> None
+    Requires: self is not empty
+    '''
+    def view(column):
+      return numpy.frombuffer(column, dtype=numpy.int64)
+    selected = None if mask is None else numpy.array(mask, dtype=bool)
+    levels = view(self.level)
+    levels += 1 if selected is None else selected
+    for column, below in ((self.st, None), (self.max_hp, self.hp),
+                          (self.max_mp, self.mp)):
+      values = view(column)
+      increase = numpy.floor(values * increase_factor).astype(numpy.int64)
+      increase += 1
+      if selected is not None:
+        increase *= selected
+      values += increase
+      if below is not None:
+        below_values = view(below)
+        below_values += increase
+
+
+##The numpy module once _numpy() has looked for it: None if it is not
+##installed, and False before it has been looked for.
+_numpy_module = False
+
+
+def _numpy():
+  '''
+  Returns the numpy module, or None if it is not installed. It is only
+  imported the first time it is needed, so that importing this module
+  stays cheap.
+  
+  Effects: Mutates _numpy_module
+  
+  _numpy: None -> (anyof Module None)
+  '''
+  global _numpy_module
+  if _numpy_module is False:
+    try:
+      import numpy
+    except ImportError:
+      numpy = None
+    _numpy_module = numpy
+  return _numpy_module
+
+
+def all_punch_batch(players, offsets, enemies):
+  '''
+  Returns None but simulates many independent all_punch encounters
+  at once. Encounter i is the party of rows offsets[i] up to, but 
+  not including, offsets[i+1] of players punching row i of enemies.
+  Each enemy loses twice the st of each attacker in its party. An 
+  enemy whose hp runs out has its hp set to 0, and every row of its
+  party is levelled up. The damage dealt in each encounter is a 
+  difference of two prefix sums of the attackers' damage, and all
+  winning parties are levelled up in one call to players.level_up.
+  
+  Effects: Mutates players
+           Mutates enemies
+  
+  all_punch_batch: CharacterPool (listof Nat) CharacterPool -> None
+  Requires: players and enemies are not the same CharacterPool
+            len(offsets) == len(enemies) + 1
+            offsets[0] == 0, offsets[-1] == len(players), and
+              offsets is non-decreasing
+  
+  Examples:
+     players = CharacterPool([d1, d2, d3, d4, d5])
+     enemies = CharacterPool([e2, e4])
+     all_punch_batch(players, [0, 3, 5], enemies) => None
+     and players and enemies are mutated as
+     all_punch([d1, d2, d3], e2) and all_punch([d4, d5], e4) 
+     would mutate d1, ..., d5, e2 and e4.
+  '''
+  damage = list(accumulate(map(mul, players.st, repeat(punch_factor_st)),
+                           initial=0))
+  party_damage = [damage[i] for i in offsets]
+  hp = list(map(sub, enemies.hp, map(sub, party_damage[1:], party_damage)))
+  winners = [False] * len(players)
+  for i in range(len(hp)):
+    if hp[i] <= 0:
+      hp[i] = 0
+      start = offsets[i]
+      end = offsets[i + 1]
+      winners[start:end] = [True] * (end - start)
+  enemies.hp[:] = array("q", hp)
+  players.level_up(winners)
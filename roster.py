@@ -0,0 +1,269 @@
+##Binary roster snapshots: a fixed-width file format for saving the
+##state of many Characters at once, and reading it back through mmap
+##without parsing it.
+##
+##A roster file holding count characters is laid out as:
+##   header        magic b"RPGR", version (uint32), count (uint64),
+##                 name_bytes (uint64), all little-endian
+##   name offsets  count + 1 little-endian int64s; name i is bytes
+##                 offsets[i] up to offsets[i+1] of the name table
+##   name table    name_bytes bytes of UTF-8, padded with zeros to a
+##                 multiple of 8 bytes
+##   columns       count little-endian int64s for each of st, hp,
+##                 max_hp, mp, max_mp and level, in that order
+
+import mmap
+import struct
+import sys
+from array import array
+from itertools import accumulate
+from role_playing_game import Character, CharacterPool
+
+##Constants:
+magic = b"RPGR"
+version = 1
+header = struct.Struct("<4sIQQ")
+columns = ("st", "hp", "max_hp", "mp", "max_mp", "level")
+native_little = sys.byteorder == "little"
+
+
+class RosterError(Exception):
+  '''
+  A file is not a roster snapshot this module can read.
+  '''
+  pass
+
+
+def padding(size):
+  '''
+  Returns the number of zero bytes needed after size bytes to reach
+  a multiple of 8 bytes.
+
+  padding: Nat -> Nat
+
+  Examples:
+     padding(8) => 0
+     padding(13) => 3
+  '''
+  return -size % 8
+
+
+def little_endian_bytes(column):
+  '''
+  Returns the contents of column as little-endian bytes.
+
+  little_endian_bytes: (arrayof Int) -> Bytes
+  '''
+  if not native_little:
+    column = array(column.typecode, column)
+    column.byteswap()
+  return column.tobytes()
+
+
+def write_roster(path, characters):
+  '''
+  Writes a roster snapshot of characters to the file at path,
+  replacing the file if it exists. characters may be a CharacterPool
+  or a list of Characters; a list is copied into a CharacterPool so
+  that each column is written in one piece.
+
+  Effects: Writes a file
+
+  write_roster: Str (anyof CharacterPool (listof Character)) -> None
+  Requires: every stat fits in a signed 64-bit integer
+
+  Examples:
+     write_roster("world.roster", [Character("Test", 1, 4, 5)]) => None
+     and world.roster holds one character, Test.
+  '''
+  if not isinstance(characters, CharacterPool):
+    characters = CharacterPool(characters)
+  names = list(map(lambda name: name.encode("utf-8"), characters.names))
+  offsets = array("q", accumulate(map(len, names), initial=0))
+  table = b"".join(names)
+  with open(path, "wb") as f:
+    f.write(header.pack(magic, version, len(names), len(table)))
+    f.write(little_endian_bytes(offsets))
+    f.write(table)
+    f.write(bytes(padding(len(table))))
+    for field in columns:
+      f.write(little_endian_bytes(getattr(characters, field)))
+
+
+class RosterSnapshot:
+  '''
+  Fields:
+     count(Nat)
+     st(memoryview of Int)
+     hp(memoryview of Int)
+     max_hp(memoryview of Int)
+     mp(memoryview of Int)
+     max_mp(memoryview of Int)
+     level(memoryview of Int)
+
+  A roster snapshot file opened through mmap. Columns are read
+  straight from the mapped file without copying, so opening a
+  snapshot only costs the pages that are actually read. Characters
+  are only created when they are asked for. The snapshot must be
+  closed, or used in a with statement, to release the file.
+
+  On a big-endian machine the columns are copied into arrays
+  instead, since they are stored little-endian.
+  '''
+  def __init__(self, path):
+    '''
+    Initializes a RosterSnapshot object self for the roster
+    snapshot file at path.
+
+    Effects: Mutates self
+             Reads a file
+
+    __init__: RosterSnapshot Str -> None
+    Requires: the file at path is not modified while self is open
+    '''
+    with open(path, "rb") as f:
+      if f.seek(0, 2) == 0:
+        raise RosterError("{0} is empty".format(path))
+      self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if len(self._map) < header.size:
+      self.close()
+      raise RosterError("{0} is too short to be a roster".format(path))
+    found, found_version, count, name_bytes = header.unpack_from(self._map)
+    if found != magic or found_version != version:
+      self.close()
+      raise RosterError("{0} is not a version {1} roster".format(
+        path, version))
+    self.count = count
+    table_start = header.size + 8 * (count + 1)
+    column_start = table_start + name_bytes + padding(name_bytes)
+    if len(self._map) != column_start + 8 * count * len(columns):
+      self.close()
+      raise RosterError("{0} has the wrong size for {1} characters".format(
+        path, count))
+    self._bytes = memoryview(self._map)
+    self._offsets = self._column(header.size, count + 1)
+    self._table = self._bytes[table_start:table_start + name_bytes]
+    for i, field in enumerate(columns):
+      setattr(self, field,
+              self._column(column_start + 8 * count * i, count))
+
+
+  def _column(self, start, length):
+    '''
+    Returns the length int64s starting at byte start of the file.
+
+    _column: RosterSnapshot Nat Nat -> (anyof memoryview (arrayof Int))
+    '''
+    view = self._bytes[start:start + 8 * length]
+    if native_little:
+      return view.cast("q")
+    column = array("q", view.tobytes())
+    column.byteswap()
+    return column
+
+
+  def __len__(self):
+    '''
+    Returns the number of characters in self
+
+    __len__: RosterSnapshot -> Nat
+    '''
+    return self.count
+
+
+  def name(self, index):
+    '''
+    Returns the name of character index of self.
+
+    name: RosterSnapshot Nat -> Str
+    Requires: 0 <= index < len(self)
+    '''
+    start = self._offsets[index]
+    return str(self._table[start:self._offsets[index + 1]], "utf-8")
+
+
+  def __getitem__(self, index):
+    '''
+    Returns a new Character equal to character index of self.
+    Negative indices count from the end, as they do for lists.
+
+    __getitem__: RosterSnapshot Int -> Character
+    '''
+    index = range(self.count)[index]
+    c = Character(self.name(index), self.st[index],
+                  self.max_hp[index], self.max_mp[index])
+    c.hp = self.hp[index]
+    c.mp = self.mp[index]
+    c.level = self.level[index]
+    c.touch()
+    return c
+
+
+  def to_pool(self):
+    '''
+    Returns a new CharacterPool holding every character of self.
+    Each column is copied in one piece.
+
+    to_pool: RosterSnapshot -> CharacterPool
+    '''
+    pool = CharacterPool()
+    text = str(self._table, "utf-8")
+    if len(text) == len(self._table):
+      # All of the names are ASCII, so byte offsets are also string
+      # offsets and the table only needs to be decoded once.
+      offsets = self._offsets.tolist()
+      pool.names = list(map(lambda start, end: text[start:end],
+                            offsets, offsets[1:]))
+    else:
+      pool.names = list(map(self.name, range(self.count)))
+    for field in columns:
+      column = array("q")
+      column.frombytes(memoryview(getattr(self, field)).cast("B"))
+      setattr(pool, field, column)
+    return pool
+
+
+  def close(self):
+    '''
+    Releases the file mapped by self. self cannot be used afterwards.
+
+    Effects: Mutates self
+
+    close: RosterSnapshot -> None
+    '''
+    for field in ("_offsets", "_table") + columns + ("_bytes",):
+      view = self.__dict__.pop(field, None)
+      if isinstance(view, memoryview):
+        view.release()
+    self._map.close()
+
+
+  def __enter__(self):
+    '''
+    Returns self, so a RosterSnapshot can be used in a with statement.
+
+    __enter__: RosterSnapshot -> RosterSnapshot
+    '''
+    return self
+
+
+  def __exit__(self, kind, value, traceback):
+    '''
+    Closes self at the end of a with statement.
+
+    Effects: Mutates self
+
+    __exit__: RosterSnapshot Any Any Any -> None
+    '''
+    self.close()
+
+
+def open_roster(path):
+  '''
+  Returns the roster snapshot file at path, opened through mmap.
+
+  Effects: Reads a file
+
+  open_roster: Str -> RosterSnapshot
+  '''
+  return RosterSnapshot(path)
@@ -0,0 +1,401 @@
+##An asyncio battle server that owns a world of Characters and runs
+##commands from many concurrent sessions against it, and a load
+##generator for measuring it.
+##
+##Sessions connect over TCP or a Unix socket and send commands as JSON
+##objects, one per line. Commands are the actions of replay.py, with
+##an optional "tag" that is copied into the reply, plus
+##   {"op": "get", "id": Nat}
+##which replies with the fields of a Character. Each command gets one
+##reply line, {"tag": ..., "result": ...} or {"tag": ..., "error": Str},
+##and each session's replies come back in the order it sent them.
+##
+##Commands are not run as they arrive. They are queued, and once per
+##tick the whole queue is run in arrival order, so commands that touch
+##the same characters are never interleaved. Each run of consecutive
+##cast_spell commands in the queue is resolved with a single call to
+##cast_many.
+##
+##Usage: python server.py serve [--port N | --unix PATH] [--tick S]
+##       python server.py load [--port N | --unix PATH] [--sessions N]
+##                             [--commands N] [--window N]
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+from role_playing_game import cast_many
+from replay import apply_action
+
+##Constants:
+default_port = 8116
+default_tick = 0.001
+
+
+class BattleServer:
+  '''
+  Fields:
+     world(listof Character)
+     tick(Float)
+     pending(listof (list (dictof Str Any) Future))
+
+  Runs the commands of every session against world, in batches
+  collected over tick seconds.
+  '''
+  def __init__(self, tick=default_tick):
+    '''
+    Initializes a BattleServer object self with an empty world that
+    runs queued commands every tick seconds.
+
+    Effects: Mutates self
+
+    __init__: BattleServer Float -> None
+    '''
+    self.world = []
+    self.tick = tick
+    self.pending = []
+
+
+  def submit(self, command):
+    '''
+    Queues command to be run at the end of the current tick, and
+    returns a Future for its reply.
+
+    Effects: Mutates self
+
+    submit: BattleServer (dictof Str Any) -> Future
+    '''
+    loop = asyncio.get_running_loop()
+    reply = loop.create_future()
+    if not self.pending:
+      loop.call_later(self.tick, self.flush)
+    self.pending.append([command, reply])
+    return reply
+
+
+  def flush(self):
+    '''
+    Runs every queued command in the order it was queued, and sets
+    the reply of each one.
+
+    Effects: Mutates self
+             Mutates the Characters in self.world
+
+    flush: BattleServer -> None
+    '''
+    batch = self.pending
+    self.pending = []
+    i = 0
+    while i < len(batch):
+      j = i
+      while j < len(batch) and batch[j][0].get("op") == "cast_spell":
+        j = j + 1
+      if j > i:
+        self.cast_run(batch[i:j])
+        i = j
+      else:
+        self.run_one(batch[i])
+        i = i + 1
+
+
+  def cast_run(self, run):
+    '''
+    Runs a run of cast_spell commands with one call to cast_many.
+    Each reply is the cast's outcome code. If any command in run is
+    malformed, the commands are run one at a time instead, so only
+    the malformed ones fail. Every command in run gets a reply, even
+    if cast_many fails.
+
+    Effects: Mutates the Characters in self.world
+
+    cast_run: BattleServer (listof (list (dictof Str Any) Future)) -> None
+    '''
+    world = self.world
+    try:
+      casts = list(map(lambda entry: cast_args(world, entry[0]), run))
+    except (KeyError, IndexError, TypeError):
+      for entry in run:
+        self.run_one(entry)
+      return
+    try:
+      outcomes = cast_many(casts)
+    except Exception as error:
+      for entry in run:
+        reply(entry, None, "{0}: {1}".format(type(error).__name__, error))
+      return
+    for entry, outcome in zip(run, outcomes):
+      reply(entry, outcome)
+
+
+  def run_one(self, entry):
+    '''
+    Runs a single command and sets its reply.
+
+    Effects: Mutates self.world
+             Mutates the Characters in self.world
+
+    run_one: BattleServer (list (dictof Str Any) Future) -> None
+    '''
+    command = entry[0]
+    world = self.world
+    try:
+      op = command.get("op")
+      if op == "reject":
+        raise ValueError(command["reason"])
+      elif op == "get":
+        c = world[command["id"]]
+        result = {"name": c.name, "st": c.st, "hp": c.hp,
+                  "max_hp": c.max_hp, "mp": c.mp, "max_mp": c.max_mp,
+                  "level": c.level}
+      elif op == "cast_spell":
+        result = cast_many([cast_args(world, command)])[0]
+      else:
+        apply_action(world, command)
+        if op == "new":
+          result = len(world) - 1
+        elif op == "all_punch":
+          result = world[command["enemy"]].hp
+        else:
+          result = None
+    except (KeyError, IndexError, TypeError, ValueError) as error:
+      reply(entry, None, "{0}: {1}".format(type(error).__name__, error))
+      return
+    reply(entry, result)
+
+
+  async def session(self, reader, writer):
+    '''
+    Serves one session: reads its commands, queues them, and writes
+    their replies in order until the session stops sending, and then
+    waits for the replies still owed to it before closing.
+
+    Effects: Reads from reader
+             Writes to writer
+
+    session: BattleServer StreamReader StreamWriter -> None
+    '''
+    outstanding = set()
+    def send(reply):
+      outstanding.discard(reply)
+      if not writer.is_closing():
+        writer.write(json.dumps(reply.result()).encode() + b"\n")
+    try:
+      while True:
+        line = await reader.readline()
+        if not line:
+          break
+        try:
+          command = json.loads(line)
+          if not isinstance(command, dict):
+            raise ValueError("a command must be a JSON object")
+        except ValueError as error:
+          # Queued like any other command, so that its reply is not
+          # sent ahead of the replies to earlier commands.
+          command = {"op": "reject", "reason": str(error)}
+        future = self.submit(command)
+        outstanding.add(future)
+        future.add_done_callback(send)
+        await writer.drain()
+      if outstanding:
+        await asyncio.wait(list(outstanding))
+      await writer.drain()
+    except ConnectionError:
+      pass
+    finally:
+      writer.close()
+
+
+def cast_args(world, command):
+  '''
+  Returns the (caster, cost, damage, enemy) of the cast_spell command
+  command against world. Raises KeyError or IndexError if a field or
+  character is missing, and TypeError if cost or damage is not a 
+  number, so that a bad cast is rejected before anything is mutated.
+
+  cast_args: (listof Character) (dictof Str Any)
+             -> (list Character Num Num Character)
+  '''
+  cost = command["cost"]
+  damage = command["damage"]
+  for value in (cost, damage):
+    if type(value) not in (int, float):
+      raise TypeError("cost and damage must be numbers")
+  return (world[command["caster"]], cost, damage, world[command["enemy"]])
+
+
+def reply(entry, result, error=None):
+  '''
+  Sets the reply of the queued command entry to result, or to error
+  if error is not None.
+
+  Effects: Mutates the Future in entry
+
+  reply: (list (dictof Str Any) Future) Any (anyof Str None) -> None
+  '''
+  command, future = entry
+  if error is None:
+    future.set_result({"tag": command.get("tag"), "result": result})
+  else:
+    future.set_result({"tag": command.get("tag"), "error": error})
+
+
+async def start(server, port=default_port, unix=None):
+  '''
+  Returns an asyncio Server serving sessions for server on a Unix
+  socket at unix, or on TCP port port of localhost if unix is None.
+
+  Effects: Opens a socket
+
+  start: BattleServer Nat (anyof Str None) -> asyncio.Server
+  '''
+  if unix is not None:
+    return await asyncio.start_unix_server(server.session, unix)
+  return await asyncio.start_server(server.session, "127.0.0.1", port)
+
+
+async def serve(port, unix, tick):
+  '''
+  Runs a BattleServer until it is interrupted.
+
+  Effects: Opens a socket
+
+  serve: Nat (anyof Str None) Float -> None
+  '''
+  listener = await start(BattleServer(tick), port, unix)
+  async with listener:
+    await listener.serve_forever()
+
+
+async def connect(port=default_port, unix=None):
+  '''
+  Returns a StreamReader and StreamWriter connected to a
+  BattleServer, as start would serve it.
+
+  Effects: Opens a socket
+
+  connect: Nat (anyof Str None) -> (list StreamReader StreamWriter)
+  '''
+  if unix is not None:
+    return list(await asyncio.open_unix_connection(unix))
+  return list(await asyncio.open_connection("127.0.0.1", port))
+
+
+async def load_session(port, unix, commands, window, characters, seed):
+  '''
+  Sends commands random cast_spell, level_up and all_punch commands
+  against characters 0 up to characters of the world, keeping at
+  most window of them waiting for a reply, and returns the latency
+  of each command in seconds.
+
+  Effects: Opens a socket
+
+  load_session: Nat (anyof Str None) Nat Nat Nat Int
+                -> (listof Float)
+  '''
+  reader, writer = await connect(port, unix)
+  rng = random.Random(seed)
+  sent = {}
+  latencies = []
+  slots = asyncio.Semaphore(window)
+  async def receive():
+    for i in range(commands):
+      line = await reader.readline()
+      answer = json.loads(line)
+      latencies.append(time.perf_counter() - sent.pop(answer["tag"]))
+      slots.release()
+  receiver = asyncio.ensure_future(receive())
+  for i in range(commands):
+    kind = rng.random()
+    if kind < 0.8:
+      command = {"op": "cast_spell", "caster": rng.randrange(characters),
+                 "cost": rng.randrange(3), "damage": rng.randrange(20),
+                 "enemy": rng.randrange(characters)}
+    elif kind < 0.85:
+      command = {"op": "level_up", "id": rng.randrange(characters)}
+    else:
+      command = {"op": "all_punch",
+                 "players": rng.sample(range(characters), 3),
+                 "enemy": rng.randrange(characters)}
+    command["tag"] = i
+    await slots.acquire()
+    sent[i] = time.perf_counter()
+    writer.write(json.dumps(command).encode() + b"\n")
+    await writer.drain()
+  await receiver
+  writer.close()
+  return latencies
+
+
+async def load(port, unix, sessions, commands, window, characters=1000):
+  '''
+  Creates characters characters on a running BattleServer, runs
+  sessions concurrent load_sessions of commands commands each
+  against them, and prints the p50 and p99 latency and the number
+  of commands completed per second.
+
+  Effects: Prints to screen
+           Opens sockets
+
+  load: Nat (anyof Str None) Nat Nat Nat Nat -> None
+  '''
+  reader, writer = await connect(port, unix)
+  first = None
+  for i in range(characters):
+    writer.write(json.dumps({"op": "new", "name": "NPC{0}".format(i),
+                             "st": 1 + i % 20, "max_hp": 10 ** 6,
+                             "max_mp": 10 ** 6}).encode() + b"\n")
+  await writer.drain()
+  for i in range(characters):
+    created = json.loads(await reader.readline())["result"]
+    if first is None:
+      first = created
+  writer.close()
+  start_time = time.perf_counter()
+  results = await asyncio.gather(*map(
+    lambda n: load_session(port, unix, commands, window, first + characters,
+                           n),
+    range(sessions)))
+  seconds = time.perf_counter() - start_time
+  latencies = sorted(sum(results, []))
+  cuts = statistics.quantiles(latencies, n=100)
+  print("{0} commands from {1} sessions in {2:.3f} s".format(
+    len(latencies), sessions, seconds))
+  print("p50 latency {0:.3f} ms, p99 latency {1:.3f} ms".format(
+    cuts[49] * 1000, cuts[98] * 1000))
+  print("{0:.0f} commands/s".format(len(latencies) / seconds))
+
+
+def main(args):
+  '''
+  Serves or load-tests a BattleServer, as described at the top of
+  this file.
+
+  Effects: Opens sockets
+           Prints to screen
+
+  main: (listof Str) -> None
+  '''
+  parser = argparse.ArgumentParser(description="Battle server")
+  parser.add_argument("mode", choices=["serve", "load"])
+  parser.add_argument("--port", type=int, default=default_port)
+  parser.add_argument("--unix", default=None)
+  parser.add_argument("--tick", type=float, default=default_tick)
+  parser.add_argument("--sessions", type=int, default=100)
+  parser.add_argument("--commands", type=int, default=1000)
+  parser.add_argument("--window", type=int, default=16)
+  options = parser.parse_args(args)
+  if options.mode == "serve":
+    try:
+      asyncio.run(serve(options.port, options.unix, options.tick))
+    except KeyboardInterrupt:
+      pass
+  else:
+    asyncio.run(load(options.port, options.unix, options.sessions,
+                     options.commands, options.window))
+
+
+if __name__ == "__main__":
+  main(sys.argv[1:])
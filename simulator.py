@@ -0,0 +1,214 @@
+##A Monte Carlo battle simulator for tuning the balance constants
+##increase_factor and punch_factor_st.
+##
+##Encounter i of a simulation with seed seed is generated from its own
+##random.Random seeded by seed and i, so it is the same no matter which
+##process runs it. Encounters are split into shards that are run
+##across a pool of processes, and each shard's statistics are integer
+##totals, so merging them gives bit-identical results for a given seed
+##whatever the number of processes.
+##
+##Usage: python simulator.py [--seed N] [--encounters N] [--processes N]
+##                           [--increase-factor F] [--punch-factor N]
+
+import argparse
+import multiprocessing
+import random
+import sys
+import time
+from collections import Counter
+import role_playing_game
+from role_playing_game import Character, NullSink, all_punch, set_event_sink
+
+##Constants:
+default_shard_size = 5000
+default_enemies = 3
+hp_bucket = 10
+
+
+def new_stats():
+  '''
+  Returns the statistics of a simulation with no encounters.
+
+  new_stats: None -> (dictof Str Any)
+  '''
+  return {"encounters": 0, "fights": 0, "wins": 0, "members": 0,
+          "levels_gained": 0, "remaining_hp": Counter()}
+
+
+def merge(total, stats):
+  '''
+  Adds the statistics stats into total.
+
+  Effects: Mutates total
+
+  merge: (dictof Str Any) (dictof Str Any) -> None
+  '''
+  for key in ("encounters", "fights", "wins", "members", "levels_gained"):
+    total[key] = total[key] + stats[key]
+  total["remaining_hp"].update(stats["remaining_hp"])
+
+
+def summary(stats):
+  '''
+  Returns the win rate, average levels gained per party member, and
+  distribution of enemies' remaining hp (by hp_bucket) in stats.
+
+  summary: (dictof Str Any) -> (dictof Str Any)
+  '''
+  fights = stats["fights"]
+  members = stats["members"]
+  return {"encounters": stats["encounters"],
+          "win_rate": stats["wins"] / fights if fights else 0.0,
+          "average_levels_gained":
+            stats["levels_gained"] / members if members else 0.0,
+          "remaining_hp": dict(sorted(stats["remaining_hp"].items()))}
+
+
+def run_encounter(seed, index, enemies, stats):
+  '''
+  Generates and runs encounter index of the simulation with seed
+  seed: a random party of 1 to 5 Characters punches each of enemies
+  random enemies once, in turn. The results are added to stats.
+
+  Effects: Mutates stats
+
+  run_encounter: Int Nat Nat (dictof Str Any) -> None
+  '''
+  rng = random.Random("{0}:{1}".format(seed, index))
+  party = list(map(lambda i: Character("P{0}".format(i),
+                                       rng.randint(1, 20),
+                                       rng.randint(10, 100),
+                                       rng.randint(0, 50)),
+                   range(rng.randint(1, 5))))
+  for i in range(enemies):
+    enemy = Character("E{0}".format(i), rng.randint(1, 50),
+                      rng.randint(10, 300), rng.randint(0, 50))
+    all_punch(party, enemy)
+    if enemy.hp == 0:
+      stats["wins"] = stats["wins"] + 1
+    stats["remaining_hp"][enemy.hp // hp_bucket * hp_bucket] += 1
+  stats["encounters"] = stats["encounters"] + 1
+  stats["fights"] = stats["fights"] + enemies
+  stats["members"] = stats["members"] + len(party)
+  stats["levels_gained"] = stats["levels_gained"] + \
+    sum(map(lambda c: c.level - 1, party))
+
+
+def run_shard(shard):
+  '''
+  Runs encounters start up to, but not including, stop of a
+  simulation, as described by shard, and returns their statistics.
+  The balance constants are set for the shard and restored after.
+  Events are discarded while the shard runs.
+
+  Effects: Mutates role_playing_game while it runs
+
+  run_shard: (list Int Nat Nat Nat Float Num) -> (dictof Str Any)
+  '''
+  seed, start, stop, enemies, factor, punch = shard
+  old = [role_playing_game.increase_factor,
+         role_playing_game.punch_factor_st]
+  old_sink = set_event_sink(NullSink())
+  role_playing_game.increase_factor = factor
+  role_playing_game.punch_factor_st = punch
+  try:
+    stats = new_stats()
+    for index in range(start, stop):
+      run_encounter(seed, index, enemies, stats)
+  finally:
+    role_playing_game.increase_factor = old[0]
+    role_playing_game.punch_factor_st = old[1]
+    set_event_sink(old_sink)
+  return stats
+
+
+def simulate_iter(seed, encounters, processes=None,
+                  shard_size=default_shard_size, enemies=default_enemies,
+                  increase_factor=None, punch_factor_st=None):
+  '''
+  Runs encounters encounters of the simulation with seed seed, using
+  a pool of processes (one per CPU if processes is None, or none if
+  processes is 1), and produces the statistics of the encounters run
+  so far each time a shard finishes. The balance constants default
+  to the current values in role_playing_game.
+
+  Effects: Runs processes
+
+  simulate_iter: Int Nat (anyof Nat None) Nat Nat (anyof Float None)
+                 (anyof Num None) -> (generatorof (dictof Str Any))
+  Requires: shard_size > 0
+  '''
+  if increase_factor is None:
+    increase_factor = role_playing_game.increase_factor
+  if punch_factor_st is None:
+    punch_factor_st = role_playing_game.punch_factor_st
+  shards = list(map(lambda start: [seed, start,
+                                   min(start + shard_size, encounters),
+                                   enemies, increase_factor,
+                                   punch_factor_st],
+                    range(0, encounters, shard_size)))
+  total = new_stats()
+  if processes == 1:
+    for stats in map(run_shard, shards):
+      merge(total, stats)
+      yield total
+  else:
+    with multiprocessing.Pool(processes) as pool:
+      for stats in pool.imap(run_shard, shards):
+        merge(total, stats)
+        yield total
+
+
+def simulate(seed, encounters, processes=None, **options):
+  '''
+  Returns the statistics of encounters encounters of the simulation
+  with seed seed, run as simulate_iter runs them.
+
+  Effects: Runs processes
+
+  simulate: Int Nat (anyof Nat None) Any ... -> (dictof Str Any)
+  '''
+  total = new_stats()
+  for total in simulate_iter(seed, encounters, processes, **options):
+    pass
+  return total
+
+
+def main(args):
+  '''
+  Runs a simulation described by args, printing progress as shards
+  finish and then a summary and the encounters run per second.
+
+  Effects: Prints to screen
+           Runs processes
+
+  main: (listof Str) -> None
+  '''
+  parser = argparse.ArgumentParser(description="Monte Carlo battles")
+  parser.add_argument("--seed", type=int, default=116)
+  parser.add_argument("--encounters", type=int, default=200000)
+  parser.add_argument("--processes", type=int, default=None)
+  parser.add_argument("--enemies", type=int, default=default_enemies)
+  parser.add_argument("--increase-factor", type=float, default=None)
+  parser.add_argument("--punch-factor", type=int, default=None)
+  options = parser.parse_args(args)
+  start = time.perf_counter()
+  total = new_stats()
+  for total in simulate_iter(options.seed, options.encounters,
+                             options.processes, enemies=options.enemies,
+                             increase_factor=options.increase_factor,
+                             punch_factor_st=options.punch_factor):
+    print("{0} encounters, win rate {1:.4f}".format(
+      total["encounters"], summary(total)["win_rate"]), file=sys.stderr)
+  seconds = time.perf_counter() - start
+  result = summary(total)
+  print("win rate {0:.6f}".format(result["win_rate"]))
+  print("average levels gained {0:.6f}".format(
+    result["average_levels_gained"]))
+  print("remaining hp: {0}".format(result["remaining_hp"]))
+  print("{0:.0f} encounters/s".format(total["encounters"] / seconds))
+
+
+if __name__ == "__main__":
+  main(sys.argv[1:])
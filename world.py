@@ -0,0 +1,275 @@
+##A registry of the Characters in a world, indexed so that an AI can
+##choose targets without scanning every Character.
+##
+##A World keeps a dictionary of Characters by name, the set of defeated
+##Characters, and heaps ordered by hp (living Characters only), level
+##and st. A Character belongs to at most one World, which is one of its
+##observers; Character.touch() tells that World whenever the
+##Character changes, and cast_spell, level_up, all_punch and cast_many
+##all touch the Characters they mutate, so the indexes stay up to date
+##on their own.
+##
+##The heaps are lazy: a change pushes a new entry rather than finding
+##and removing the old one, and out of date entries are thrown away
+##when they reach the top of a heap. When a heap grows to more than
+##twice the size of the World it is rebuilt from its live entries.
+
+import heapq
+from itertools import count
+
+##Constants:
+indexed_fields = ("hp", "level", "st")
+compact_slack = 16
+
+
+class World:
+  '''
+  Fields:
+     by_name(dictof Str (listof Character))
+     defeated(dictof Int Character)
+
+  An indexed registry of Characters. by_name maps each name to the
+  Characters with that name, oldest first, and defeated maps the id
+  of each Character with no hp left to that Character.
+  '''
+  def __init__(self, characters=()):
+    '''
+    Initializes a World object self holding each Character in
+    characters.
+
+    Effects: Mutates self
+             Mutates the Characters in characters
+
+    __init__: World (listof Character) -> None
+    '''
+    self.by_name = {}
+    self.defeated = {}
+    # _records[id(c)] is [c, name, hp, level, st, and the sequence
+    # number of c's live entry in the hp, level and st heaps].
+    self._records = {}
+    self._heaps = {"hp": [], "level": [], "st": []}
+    self._sequence = count()
+    for character in characters:
+      self.add(character)
+
+
+  def __len__(self):
+    '''
+    Returns the number of Characters in self
+
+    __len__: World -> Nat
+    '''
+    return len(self._records)
+
+
+  def __contains__(self, character):
+    '''
+    Returns True if character itself, not just one equal to it, is in
+    self and False otherwise.
+
+    __contains__: World Character -> Bool
+    '''
+    return any(map(lambda observer: observer is self, character.observers()))
+
+
+  def add(self, character):
+    '''
+    Adds character to self. Raises ValueError if character is already
+    in a World.
+
+    Effects: Mutates self
+             Mutates character
+
+    add: World Character -> None
+    '''
+    if any(map(lambda observer: isinstance(observer, World),
+               character.observers())):
+      raise ValueError("{0} is already in a World".format(character.name))
+    character.add_observer(self)
+    self._records[id(character)] = [character, character.name,
+                                    None, None, None, None, None, None]
+    self.by_name.setdefault(character.name, []).append(character)
+    self.notify(character)
+
+
+  def remove(self, character):
+    '''
+    Removes character from self. Raises ValueError if character is
+    not in self.
+
+    Effects: Mutates self
+             Mutates character
+
+    remove: World Character -> None
+    '''
+    if character not in self:
+      raise ValueError("{0} is not in this World".format(character.name))
+    record = self._records.pop(id(character))
+    self._unname(character, record[1])
+    self.defeated.pop(id(character), None)
+    character.remove_observer(self)
+
+
+  def _unname(self, character, name):
+    '''
+    Removes character from the Characters in self.by_name called name.
+
+    Effects: Mutates self
+
+    _unname: World Character Str -> None
+    '''
+    named = self.by_name[name]
+    for i in range(len(named)):
+      if named[i] is character:
+        del named[i]
+        break
+    if not named:
+      del self.by_name[name]
+
+
+  def notify(self, character):
+    '''
+    Updates the indexes of self for the current fields of character.
+    Called by character.touch().
+
+    Effects: Mutates self
+
+    notify: World Character -> None
+    Requires: character is in self
+    '''
+    record = self._records[id(character)]
+    if record[1] != character.name:
+      self._unname(character, record[1])
+      self.by_name.setdefault(character.name, []).append(character)
+      record[1] = character.name
+    hp = character.hp
+    if hp <= 0:
+      self.defeated[id(character)] = character
+      record[2] = hp
+      record[5] = None
+    else:
+      self.defeated.pop(id(character), None)
+      if record[5] is None or record[2] != hp:
+        record[2] = hp
+        record[5] = self._push("hp", hp, character)
+    level = character.level
+    if record[6] is None or record[3] != level:
+      record[3] = level
+      record[6] = self._push("level", -level, character)
+    st = character.st
+    if record[7] is None or record[4] != st:
+      record[4] = st
+      record[7] = self._push("st", -st, character)
+
+
+  def _push(self, field, key, character):
+    '''
+    Pushes an entry for character with key key onto the heap for
+    field, and returns its sequence number. The heap is first rebuilt
+    from its live entries if it has grown too large, so the new entry,
+    which is not live until its sequence number is recorded, is kept.
+
+    Effects: Mutates self
+
+    _push: World Str Int Character -> Nat
+    '''
+    heap = self._heaps[field]
+    if len(heap) >= 2 * len(self._records) + compact_slack:
+      heap = list(filter(lambda entry: self._live(field, entry), heap))
+      heapq.heapify(heap)
+      self._heaps[field] = heap
+    sequence = next(self._sequence)
+    heapq.heappush(heap, (key, sequence, character))
+    return sequence
+
+
+  def _live(self, field, entry):
+    '''
+    Returns True if entry is the current entry of its Character in
+    the heap for field and False otherwise.
+
+    _live: World Str (list Int Nat Character) -> Bool
+    '''
+    character = entry[2]
+    record = self._records.get(id(character))
+    return record is not None and record[0] is character and \
+      record[5 + indexed_fields.index(field)] == entry[1]
+
+
+  def _top(self, field):
+    '''
+    Discards out of date entries from the top of the heap for field,
+    and returns its top entry, or None if it is empty.
+
+    Effects: Mutates self
+
+    _top: World Str -> (anyof (list Int Nat Character) None)
+    '''
+    heap = self._heaps[field]
+    while heap and not self._live(field, heap[0]):
+      heapq.heappop(heap)
+    return heap[0] if heap else None
+
+
+  def named(self, name):
+    '''
+    Returns a list of the Characters in self called name, oldest
+    first.
+
+    named: World Str -> (listof Character)
+    '''
+    return list(self.by_name.get(name, ()))
+
+
+  def lowest_hp(self):
+    '''
+    Returns the Character in self with the least hp that is not
+    defeated, or None if there is none. Ties go to the Character
+    whose hp changed least recently.
+
+    Effects: Mutates self
+
+    lowest_hp: World -> (anyof Character None)
+
+    Examples:
+       World([Character("C1", 10, 10, 10),
+              Character("C4", 1, 12, 13)]).lowest_hp()
+         => Character("C1", 10, 10, 10)
+    '''
+    entry = self._top("hp")
+    return None if entry is None else entry[2]
+
+
+  def all_defeated(self):
+    '''
+    Returns a list of the Characters in self with no hp left.
+
+    all_defeated: World -> (listof Character)
+    '''
+    return list(self.defeated.values())
+
+
+  def top(self, field, k):
+    '''
+    Returns a list of the k Characters in self with the highest
+    field, highest first, or all of them if self has fewer than k.
+    field is "level" or "st"; any other field raises ValueError.
+    Ties go to the Character whose field changed least recently.
+
+    Effects: Mutates self
+
+    top: World Str Nat -> (listof Character)
+
+    Examples:
+       World([Character("C1", 10, 10, 10),
+              Character("C3", 20, 20, 10)]).top("st", 1)
+         => [Character("C3", 20, 20, 10)]
+    '''
+    if field not in ("level", "st"):
+      raise ValueError("cannot rank by {0!r}".format(field))
+    found = []
+    while len(found) < k and self._top(field) is not None:
+      found.append(heapq.heappop(self._heaps[field]))
+    for entry in found:
+      heapq.heappush(self._heaps[field], entry)
+    return list(map(lambda entry: entry[2], found))